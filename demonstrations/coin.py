@@ -1,22 +1,62 @@
-from scipy.stats import binom
-import random
+import numpy as np
+
+def coin_probabilities(num_coins, rng = None):
+    """
+    Probabilities of heads for num_coins new coins. Half of the coins, on average, are fair. The
+    others get a bias drawn from a normal distribution with mean 0.5 and standard deviation 0.05,
+    rounded to two decimals and redrawn (only for the coins that need it) while within 0.03 of 0.5.
+    """
+    rng = np.random.default_rng(rng)
+    p = np.full(num_coins, 0.5)
+    redraw = rng.random(num_coins) >= 0.5
+    while redraw.any():
+        p[redraw] = np.round(rng.normal(0.5, 0.05, size = redraw.sum()), 2)
+        redraw &= np.abs(p - 0.5) <= 0.03
+    return p
+
+class CoinSimulation():
+    """
+    Many coins at once, for checking decision rules on simulated data:
+
+        coins = CoinSimulation(1000000)
+        heads = coins.flip(100)
+        coins.error_rates(lambda heads, number_flips: np.abs(heads - number_flips / 2) <= 10, 100)
+    """
+    def __init__(self, num_coins, random_state = None):
+        self.rng = np.random.default_rng(random_state)
+        self.p = coin_probabilities(num_coins, self.rng)
+
+    @property
+    def fair(self):
+        return self.p == 0.5
+
+    def flip(self, number_flips):
+        """Number of heads in number_flips flips of every coin (number_flips may also be an array, one entry per coin)."""
+        return self.rng.binomial(number_flips, self.p)
+
+    def error_rates(self, rule, number_flips):
+        """
+        Flip every coin number_flips times and score rule(heads, number_flips), which should return
+        True for the coins it calls fair. Returns the share of fair coins called unfair, the share
+        of unfair coins called fair, and the overall error rate.
+        """
+        called_fair = np.asarray(rule(self.flip(number_flips), number_flips), dtype = bool)
+        fair = self.fair
+        return {'fair called unfair': float(np.mean(~called_fair[fair])),
+                'unfair called fair': float(np.mean(called_fair[~fair])),
+                'error rate': float(np.mean(called_fair != fair))}
 
 class CoinFlipper():
-    def __init__(self):
-        fair = random.random() < 0.5
-        if fair:
-            self._p = 0.5
-        else:
-            self._p = round(random.normalvariate(0.5, 0.05), 2)
-            while abs(self._p - 0.5) <= 0.03:
-                self._p = round(random.normalvariate(0.5, 0.05), 2)
-                
+    def __init__(self, random_state = None):
+        self._coin = CoinSimulation(1, random_state)
+        self._p = float(self._coin.p[0])
+
     def flip(self, number_flips):
         if number_flips > 10:
             print("Sorry, I can't flip more than 10 times at once.")
         else:
-            print (f"The coin landed on heads {binom.rvs(p = self._p, n = number_flips)} times.")
-        
+            print (f"The coin landed on heads {self._coin.flip(number_flips)[0]} times.")
+
     def is_fair(self):
         if self._p == 0.5:
             print('This coin is fair.')
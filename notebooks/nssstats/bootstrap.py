@@ -1,17 +1,481 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
+import pandas as pd
+
+def _vectorizes(statistic, values, **kwargs):
+	# A statistic vectorizes if calling it with axis = 1 on a 2-D block
+	# gives one value per row, matching what it returns row by row.
+	probe = np.vstack([values, values[::-1]])
+	try:
+		block_result = np.asarray(statistic(probe, axis = 1, **kwargs))
+	except (TypeError, ValueError, IndexError):
+		return False
+	if block_result.shape != (2,):
+		return False
+	row_result = [statistic(row, **kwargs) for row in probe]
+	return np.allclose(block_result, row_result, equal_nan = True)
+
+def _chunk_size(values, chunk_size = None, max_bytes = 2**27):
+	if chunk_size is not None:
+		return max(1, int(chunk_size))
+	# Each resample row holds n indices plus n gathered values. Blocks are also capped
+	# at 1024 rows so that there is work to share out when running in parallel.
+	row_bytes = len(values) * (np.dtype(np.intp).itemsize + values.itemsize)
+	return max(1, min(1024, int(max_bytes // max(row_bytes, 1))))
+
+def _seed_sequence(random_state = None):
+	# With no random_state, seed from the global numpy state so np.random.seed still makes results repeatable.
+	if random_state is None:
+		random_state = np.random.randint(2**31 - 1)
+	if isinstance(random_state, np.random.Generator):
+		random_state = random_state.integers(2**63 - 1)
+	if isinstance(random_state, np.random.SeedSequence):
+		return random_state
+	return np.random.SeedSequence(random_state)
+
+def _bootstrap_blocks(block_sizes, seeds, values, statistic, vectorized, kwargs):
+	n = len(values)
+	resample_statistics = np.empty(sum(block_sizes))
+	start = 0
+	for size, seed in zip(block_sizes, seeds):
+		rng = np.random.default_rng(seed)
+		resamples = values[rng.integers(0, n, size = (size, n))]
+		if vectorized:
+			resample_statistics[start:start + size] = statistic(resamples, axis = 1, **kwargs)
+		else:
+			for i, resample in enumerate(resamples):
+				resample_statistics[start + i] = statistic(resample, **kwargs)
+		start += size
+
+	return resample_statistics
+
+# Statistics that can be computed from the counts of each distinct value, with the keyword arguments they allow.
+_COUNT_STATISTICS = {np.mean: ('mean', ()), np.sum: ('sum', ()), np.var: ('var', ('ddof',)), np.std: ('std', ('ddof',)),
+                     np.median: ('median', ()), np.quantile: ('quantile', ('q',)), np.percentile: ('percentile', ('q',))}
+
+def _count_statistic(statistic, kwargs):
+	try:
+		name, allowed = _COUNT_STATISTICS[statistic]
+	except (KeyError, TypeError):
+		return None
+	if any(key not in allowed for key in kwargs) or np.ndim(kwargs.get('q', 0)) != 0:
+		return None
+	return name
+
+def _statistic_from_counts(name, support, counts, n, kwargs):
+	# Row-wise statistics of resamples given as counts (rows, k) over the sorted distinct values `support`.
+	if name == 'sum':
+		return counts @ support
+	means = counts @ support / n
+	if name == 'mean':
+		return means
+	if name in ('var', 'std'):
+		variances = np.sum(counts * (support - means[:, None])**2, axis = 1) / (n - kwargs.get('ddof', 0))
+		return variances if name == 'var' else np.sqrt(variances)
+
+	q = {'median': 0.5, 'quantile': kwargs.get('q'), 'percentile': kwargs.get('q', 0) / 100}[name]
+	# Same linear interpolation between order statistics as np.quantile.
+	position = (n - 1) * q
+	lower = int(np.floor(position))
+	upper = min(lower + 1, n - 1)
+	cumulative = np.cumsum(counts, axis = 1)
+	lower_values = support[np.sum(cumulative <= lower, axis = 1)]
+	upper_values = support[np.sum(cumulative <= upper, axis = 1)]
+	return lower_values + (position - lower) * (upper_values - lower_values)
+
+def _count_blocks(block_sizes, seeds, support, probabilities, n, name, kwargs):
+	resample_statistics = np.empty(sum(block_sizes))
+	start = 0
+	for size, seed in zip(block_sizes, seeds):
+		rng = np.random.default_rng(seed)
+		counts = rng.multinomial(n, probabilities, size = size)
+		resample_statistics[start:start + size] = _statistic_from_counts(name, support, counts, n, kwargs)
+		start += size
+
+	return resample_statistics
+
+def _get_executor(n_jobs = 1, executor = None):
+	if executor is not None and not isinstance(executor, str):
+		return executor, False
+	if n_jobs == -1:
+		n_jobs = os.cpu_count()
+	if executor == 'thread':
+		return ThreadPoolExecutor(max_workers = n_jobs), True
+	if executor in (None, 'process'):
+		return ProcessPoolExecutor(max_workers = n_jobs), True
+	raise ValueError("Invalid entry to 'executor' input. Executor "
+	                 "must be 'process', 'thread' or a concurrent.futures.Executor.")
+
+def _run_blocks(task, block_sizes, seeds, args, n_jobs = 1, executor = None):
+	if (n_jobs == 1 and executor is None) or len(block_sizes) == 1:
+		return task(block_sizes, seeds, *args)
+
+	pool, owned = _get_executor(n_jobs, executor)
+	num_tasks = min(len(block_sizes), getattr(pool, '_max_workers', None) or len(block_sizes))
+	try:
+		futures = [pool.submit(task, list(sizes), list(task_seeds), *args)
+		           for sizes, task_seeds in zip(np.array_split(np.array(block_sizes), num_tasks),
+		                                        np.array_split(np.array(seeds, dtype = object), num_tasks))]
+		return np.concatenate([future.result() for future in futures])
+	finally:
+		if owned:
+			pool.shutdown()
+
+def generate_bootstraps(values, num_resamples = 10000, statistic = np.mean, chunk_size = None, max_bytes = 2**27,
+                        random_state = None, n_jobs = 1, executor = None, discrete = None, **kwargs):
+	"""
+	Return an array of `statistic` evaluated on `num_resamples` bootstrap resamples of `values`.
+
+	Resamples are drawn as index matrices of `chunk_size` rows at a time (by default as many
+	rows as fit in `max_bytes`). Statistics that accept `axis` (np.mean, np.median, np.std,
+	np.quantile, ...) are evaluated on a whole chunk at once; others are applied row by row.
+
+	For binary or low-cardinality data the resamples are instead drawn as multinomial counts over
+	the distinct values, so the cost depends on the number of distinct values rather than on
+	len(values). This needs `statistic` to be one of np.mean, np.sum, np.var, np.std, np.median,
+	np.quantile or np.percentile. By default (`discrete` = None) it is used whenever there are at
+	most a tenth as many distinct values as observations; pass True or False to force it on or off.
 
-def bootstrap_ci(values, conf_level = 0.95, num_resamples = 10000, statistic = np.mean, **kwargs):
+	Each chunk gets its own child of a numpy SeedSequence built from `random_state` (an int,
+	SeedSequence or Generator), so for a given seed the result is the same whatever `n_jobs` is.
+	With `n_jobs` > 1 (or -1 for all cores) the chunks are shared out over a process pool;
+	pass executor = 'thread' for a thread pool, or any concurrent.futures.Executor to reuse one.
+	A process pool needs `statistic` to be picklable, so use a thread pool for lambdas.
+	"""
+	values = np.asarray(values)
+	n = len(values)
+
+	numeric = np.issubdtype(values.dtype, np.number) or values.dtype == bool
+	name = _count_statistic(statistic, kwargs) if discrete is not False and numeric else None
+	if discrete and name is None:
+		raise ValueError("discrete = True needs statistic to be np.mean, np.sum, np.var, np.std, np.median, "
+		                 "np.quantile or np.percentile.")
+	if name is not None:
+		support, counts = np.unique(values, return_counts = True)
+		if not discrete and len(support) * 10 > n:
+			name = None
+
+	if name is not None:
+		task, args = _count_blocks, (support.astype(float), counts / n, n, name, kwargs)
+		chunk_size = _chunk_size(support, chunk_size, max_bytes)
+	else:
+		task, args = _bootstrap_blocks, (values, statistic, _vectorizes(statistic, values, **kwargs), kwargs)
+		chunk_size = _chunk_size(values, chunk_size, max_bytes)
+
+	block_sizes = [min(chunk_size, num_resamples - start) for start in range(0, num_resamples, chunk_size)]
+	seeds = _seed_sequence(random_state).spawn(len(block_sizes))
+
+	return _run_blocks(task, block_sizes, seeds, args, n_jobs = n_jobs, executor = executor)
+
+def bootstrap_ci(values, conf_level = 0.95, num_resamples = 10000, statistic = np.mean, chunk_size = None, max_bytes = 2**27,
+                 random_state = None, n_jobs = 1, executor = None, discrete = None, **kwargs):
 	point_estimate = statistic(values, **kwargs)    
 	margin = (1 - conf_level) / 2
-	lower_index = int(num_resamples * margin)
-	upper_index = int(num_resamples * (1-margin))
 
-	resample_statistics = []
-	for _ in range(num_resamples):
-		resample = np.random.choice(values, len(values))
-		resample_statistics.append(statistic(resample, **kwargs))
+	resample_statistics = generate_bootstraps(values, num_resamples = num_resamples, statistic = statistic,
+	                                          chunk_size = chunk_size, max_bytes = max_bytes,
+	                                          random_state = random_state, n_jobs = n_jobs, executor = executor,
+	                                          discrete = discrete, **kwargs)
 
 	top_quantile = np.quantile(resample_statistics, q = 1 - margin)
 	bottom_quantile = np.quantile(resample_statistics, q = margin)
 
 	return point_estimate - (top_quantile - point_estimate), point_estimate + (point_estimate - bottom_quantile) 
+
+def _quantile_se(sorted_statistics, q, z = 1.96):
+	# Distribution-free Monte Carlo standard error of the q-th sample quantile: the order statistics
+	# at B*q -/+ z*sqrt(B*q*(1-q)) bracket the true quantile, so their spread over 2z estimates its SE.
+	B = len(sorted_statistics)
+	half_width = z * np.sqrt(B * q * (1 - q))
+	lo = int(max(np.floor(B * q - half_width), 0))
+	hi = int(min(np.ceil(B * q + half_width), B - 1))
+	return (sorted_statistics[hi] - sorted_statistics[lo]) / (2 * z)
+
+def adaptive_bootstrap_ci(values, conf_level = 0.95, statistic = np.mean, tol = None, rel_tol = 0.02,
+                          batch_size = 1000, max_resamples = 100000, chunk_size = None, max_bytes = 2**27,
+                          random_state = None, n_jobs = 1, executor = None, discrete = None, **kwargs):
+	"""
+	Compute the same interval as `bootstrap_ci`, resampling in batches of `batch_size` until the
+	Monte Carlo standard error of both endpoints is at most `tol` (or, if `tol` is None, `rel_tol`
+	times the bootstrap standard error) or `max_resamples` is reached.
+
+	Returns lower, upper and a dict with the number of resamples used, the standard errors of the
+	lower and upper endpoints and whether the tolerance was met. The resampling options are
+	the same as for `generate_bootstraps`.
+	"""
+	point_estimate = statistic(values, **kwargs)
+	margin = (1 - conf_level) / 2
+	batch_seeds = _seed_sequence(random_state).spawn(int(np.ceil(max_resamples / batch_size)))
+
+	# One pool for all batches, rather than starting worker processes for each one.
+	pool, owned = _get_executor(n_jobs, executor) if n_jobs != 1 or executor is not None else (None, False)
+	resample_statistics = np.empty(0)
+	try:
+		for seed in batch_seeds:
+			num_resamples = min(batch_size, max_resamples - len(resample_statistics))
+			batch = generate_bootstraps(values, num_resamples = num_resamples, statistic = statistic,
+			                            chunk_size = chunk_size, max_bytes = max_bytes, random_state = seed,
+			                            n_jobs = n_jobs, executor = pool, discrete = discrete, **kwargs)
+			resample_statistics = np.concatenate([resample_statistics, batch])
+
+			sorted_statistics = np.sort(resample_statistics)
+			# The lower endpoint is reflected from the top quantile and the upper one from the bottom quantile.
+			lower_se = _quantile_se(sorted_statistics, 1 - margin)
+			upper_se = _quantile_se(sorted_statistics, margin)
+			threshold = tol if tol is not None else rel_tol * np.std(resample_statistics)
+			converged = max(lower_se, upper_se) <= threshold
+			if converged:
+				break
+	finally:
+		if owned:
+			pool.shutdown()
+
+	top_quantile = np.quantile(resample_statistics, q = 1 - margin)
+	bottom_quantile = np.quantile(resample_statistics, q = margin)
+	precision = {'num_resamples': len(resample_statistics), 'lower_se': lower_se, 'upper_se': upper_se,
+	             'converged': bool(converged)}
+
+	return point_estimate - (top_quantile - point_estimate), point_estimate + (point_estimate - bottom_quantile), precision
+
+def _group_statistics(values, starts, sizes, statistic):
+	# Row-wise statistics of every group segment of a (num_resamples, n) block, via np.add.reduceat.
+	sums = np.add.reduceat(values, starts, axis = 1)
+	if statistic == 'sum':
+		return sums
+	means = sums / sizes
+	if statistic in ('mean', 'proportion'):
+		return means
+	variances = (np.add.reduceat(values**2, starts, axis = 1) - sums * means) / (sizes - 1)
+	if statistic == 'variance':
+		return variances
+	return np.sqrt(variances)
+
+def grouped_bootstrap_ci(df, group_col, value_col, conf_level = 0.95, num_resamples = 10000, statistic = 'mean',
+                         contrasts = None, chunk_size = None, max_bytes = 2**27, random_state = None):
+	"""
+	Stratified bootstrap of `statistic` ('mean', 'proportion', 'sum', 'variance' or 'std') of `value_col`
+	within every group of `group_col`, resampling all groups at once.
+
+	Rows are sorted into contiguous group segments, every resample draws each row's replacement from its
+	own segment, and group statistics come from np.add.reduceat over the segments. `contrasts` is None,
+	a list of (group_a, group_b) pairs, or 'all' for every pair of groups. Differences are group_a - group_b.
+	Their resamples are taken in blocks of pairs of about max_bytes, but with G groups 'all' still means
+	G(G - 1)/2 intervals, each costing a pass over the num_resamples group statistics.
+
+	Returns a DataFrame of per-group estimates and intervals (the same intervals as `bootstrap_ci`)
+	and, unless contrasts is None, a DataFrame of the pairwise differences.
+	"""
+	if statistic not in ('mean', 'proportion', 'sum', 'variance', 'std'):
+		raise ValueError("Invalid entry to 'statistic' input. Statistic must be one of "
+		                 "'mean', 'proportion', 'sum', 'variance' or 'std'.")
+	df = df[[group_col, value_col]].dropna()
+	codes, groups = pd.factorize(df[group_col], sort = True)
+	order = np.argsort(codes, kind = 'stable')
+	sizes = np.bincount(codes, minlength = len(groups))
+	starts = np.r_[0, np.cumsum(sizes)[:-1]]
+
+	# Centering each group on its own mean keeps the sums of squares well conditioned;
+	# the means are added back on for the location statistics.
+	values = df[value_col].to_numpy(dtype = float)[order]
+	group_means = np.add.reduceat(values, starts) / sizes
+	if statistic != 'sum':
+		values = values - np.repeat(group_means, sizes)
+	offset = group_means if statistic in ('mean', 'proportion') else 0
+
+	if isinstance(contrasts, str) and contrasts == 'all':
+		pair_a, pair_b = np.triu_indices(len(groups), k = 1)
+	else:
+		pairs = list(contrasts) if contrasts is not None else []
+		group_index = {group: i for i, group in enumerate(groups)}
+		pair_a = np.array([group_index[a] for a, b in pairs], dtype = np.intp)
+		pair_b = np.array([group_index[b] for a, b in pairs], dtype = np.intp)
+
+	point_estimate = _group_statistics(values[None, :], starts, sizes, statistic)[0] + offset
+
+	row_starts = np.repeat(starts, sizes)
+	row_sizes = np.repeat(sizes, sizes)
+	chunk_size = _chunk_size(values, chunk_size, max_bytes)
+	block_sizes = [min(chunk_size, num_resamples - start) for start in range(0, num_resamples, chunk_size)]
+	seeds = _seed_sequence(random_state).spawn(len(block_sizes))
+
+	resample_statistics = np.empty((num_resamples, len(groups)))
+	start = 0
+	for size, seed in zip(block_sizes, seeds):
+		rng = np.random.default_rng(seed)
+		indices = row_starts + (rng.random((size, len(values))) * row_sizes).astype(np.intp)
+		resample_statistics[start:start + size] = _group_statistics(values[indices], starts, sizes, statistic) + offset
+		start += size
+
+	margin = (1 - conf_level) / 2
+
+	def basic_interval(estimate, replicates):
+		# Both quantiles from one partition of the replicates.
+		bottom_quantile, top_quantile = np.quantile(replicates, q = [margin, 1 - margin], axis = 0)
+		return estimate - (top_quantile - estimate), estimate + (estimate - bottom_quantile)
+
+	lower, upper = basic_interval(point_estimate, resample_statistics)
+	group_results = pd.DataFrame({group_col: groups, 'n': sizes, 'estimate': point_estimate,
+	                              'lower': lower, 'upper': upper})
+	if contrasts is None:
+		return group_results
+
+	# Differences for a block of pairs at a time: the block and the copy np.quantile partitions.
+	differences = point_estimate[pair_a] - point_estimate[pair_b]
+	lower, upper = np.empty(len(differences)), np.empty(len(differences))
+	pair_block = max(1, int(max_bytes // (2 * num_resamples * resample_statistics.itemsize)))
+	for start in range(0, len(differences), pair_block):
+		block = slice(start, start + pair_block)
+		replicates = resample_statistics[:, pair_a[block]] - resample_statistics[:, pair_b[block]]
+		lower[block], upper[block] = basic_interval(differences[block], replicates)
+	contrast_results = pd.DataFrame({'group_a': groups[pair_a], 'group_b': groups[pair_b],
+	                                 'difference': differences, 'lower': lower, 'upper': upper})
+
+	return group_results, contrast_results
+
+# Poisson(1) weights by table lookup on 16-bit uniforms, several times faster than Generator.poisson.
+# Each weight's probability is off by at most 2**-16, far below the Monte Carlo error of the bootstrap.
+_POISSON_CDF = np.cumsum(np.exp(-1) / np.cumprod(np.r_[1, np.arange(1, 20)]))
+_POISSON_TABLE = np.searchsorted(_POISSON_CDF, (np.arange(2**16) + 0.5) / 2**16).astype(np.uint8)
+
+def _poisson_weights(rng, size):
+	return _POISSON_TABLE[rng.integers(0, 2**16, size = size, dtype = np.uint16)]
+
+class StreamingBootstrap():
+	"""
+	One-pass Poisson bootstrap over data arriving in chunks, e.g. from pandas.read_csv(chunksize = ...).
+
+	Every row gets an independent Poisson(1) weight in each of `num_resamples` replicates, and only
+	the weighted cross-products of [1, columns] are kept, so memory does not grow with the data.
+	`statistic` is one of 'mean', 'proportion', 'variance', 'std' (one column), 'covariance',
+	'correlation' (two columns) or 'regression' (predictor columns followed by the response; the
+	statistic is the least squares intercept and slopes). Accumulators built on different workers
+	can be combined with `merge`, as long as they were given different random states.
+
+	With random_state None the weights are seeded from fresh entropy rather than the global numpy
+	state, which processes forked from one parent share. The SeedSequence used is kept as `seed`,
+	and `merge` raises ValueError for accumulators whose weights came from the same seed.
+	"""
+	_num_columns = {'mean': 1, 'proportion': 1, 'variance': 1, 'std': 1, 'covariance': 2, 'correlation': 2}
+
+	def __init__(self, statistic = 'mean', num_resamples = 1000, columns = None, random_state = None, max_bytes = 2**27):
+		if statistic not in self._num_columns and statistic != 'regression':
+			raise ValueError("Invalid entry to 'statistic' input. Statistic must be one of "
+			                 "'mean', 'proportion', 'variance', 'std', 'covariance', 'correlation' or 'regression'.")
+		self.statistic = statistic
+		self.num_resamples = num_resamples
+		self.columns = columns
+		self.max_bytes = max_bytes
+		self.seed = np.random.SeedSequence() if random_state is None else _seed_sequence(random_state)
+		self._rng = np.random.default_rng(self.seed)
+		# Seeds of every accumulator merged into this one, to catch repeated weight streams.
+		self._seeds = {self._seed_key(self.seed)}
+		# Columns are centered on the mean of the first chunk to keep the sums of squares well conditioned.
+		self._shift = None
+		# Weighted cross-products, one k x k matrix per replicate; row 0 uses unit weights (the data itself).
+		self._moments = None
+
+	def _prepare(self, chunk):
+		if self.columns is not None:
+			chunk = chunk[self.columns]
+		chunk = np.asarray(chunk, dtype = float)
+		if chunk.ndim == 1:
+			chunk = chunk[:, None]
+		expected = self._num_columns.get(self.statistic)
+		if (expected is not None and chunk.shape[1] != expected) or (expected is None and chunk.shape[1] < 2):
+			raise ValueError("Statistic '{}' cannot be computed from {} column(s).".format(self.statistic, chunk.shape[1]))
+		return chunk
+
+	def update(self, chunk):
+		chunk = self._prepare(chunk)
+		if self._moments is None:
+			self._shift = chunk.mean(axis = 0)
+			k = chunk.shape[1] + 1
+			self._moments = np.zeros((self.num_resamples + 1, k, k))
+
+		rows = max(1, int(self.max_bytes // (10 * (self.num_resamples + 1))))
+		for start in range(0, len(chunk), rows):
+			block = chunk[start:start + rows]
+			z = np.column_stack([np.ones(len(block)), block - self._shift])
+			products = (z[:, :, None] * z[:, None, :]).reshape(len(block), -1)
+			weights = np.vstack([np.ones(len(block)), _poisson_weights(self._rng, (self.num_resamples, len(block)))])
+			self._moments += (weights @ products).reshape(self._moments.shape)
+
+		return self
+
+	@staticmethod
+	def _seed_key(seed):
+		return seed.entropy, seed.spawn_key
+
+	def merge(self, other):
+		if other._moments is None:
+			return self
+		if (other.statistic, other.num_resamples) != (self.statistic, self.num_resamples):
+			raise ValueError("Only accumulators with the same statistic and num_resamples can be merged.")
+		if self._seeds & other._seeds:
+			raise ValueError("These accumulators drew their weights from the same seed, so their replicates "
+			                 "would be correlated; give each one its own random_state.")
+		self._seeds |= other._seeds
+		if self._moments is None:
+			self._shift, self._moments = other._shift.copy(), other._moments.copy()
+			return self
+		# Re-center the other accumulator on this one's shift: z_self = A @ z_other.
+		A = np.eye(len(self._shift) + 1)
+		A[1:, 0] = other._shift - self._shift
+		self._moments += A @ other._moments @ A.T
+		return self
+
+	def _compute(self):
+		if self._moments is None:
+			raise ValueError("No data has been added yet.")
+		W = self._moments[:, 0, 0]
+		sums = self._moments[:, 0, 1:]
+		means = sums / W[:, None] + self._shift
+		cross = self._moments[:, 1:, 1:] - sums[:, :, None] * sums[:, None, :] / W[:, None, None]
+
+		with np.errstate(divide = 'ignore', invalid = 'ignore'):
+			if self.statistic in ('mean', 'proportion'):
+				return means[:, 0]
+			if self.statistic == 'variance':
+				return cross[:, 0, 0] / (W - 1)
+			if self.statistic == 'std':
+				return np.sqrt(cross[:, 0, 0] / (W - 1))
+			if self.statistic == 'covariance':
+				return cross[:, 0, 1] / (W - 1)
+			if self.statistic == 'correlation':
+				return cross[:, 0, 1] / np.sqrt(cross[:, 0, 0] * cross[:, 1, 1])
+
+			p = cross.shape[1] - 1
+			slopes = (np.linalg.pinv(cross[:, :p, :p]) @ cross[:, :p, p:])[:, :, 0]
+			intercepts = means[:, p] - np.sum(means[:, :p] * slopes, axis = 1)
+			return np.column_stack([intercepts, slopes])
+
+	def estimate(self):
+		return self._compute()[0]
+
+	def replicates(self):
+		return self._compute()[1:]
+
+	def ci(self, conf_level = 0.95):
+		statistics = self._compute()
+		point_estimate, resample_statistics = statistics[0], statistics[1:]
+		margin = (1 - conf_level) / 2
+
+		top_quantile = np.nanquantile(resample_statistics, q = 1 - margin, axis = 0)
+		bottom_quantile = np.nanquantile(resample_statistics, q = margin, axis = 0)
+
+		return point_estimate - (top_quantile - point_estimate), point_estimate + (point_estimate - bottom_quantile)
+
+def streaming_bootstrap_ci(chunks, conf_level = 0.95, num_resamples = 1000, statistic = 'mean', columns = None,
+                           random_state = None, max_bytes = 2**27):
+	"""
+	Bootstrap confidence interval in one pass over an iterable of chunks (arrays or DataFrames,
+	such as pandas.read_csv(path, chunksize = 100000)). See `StreamingBootstrap` for the statistics.
+	"""
+	accumulator = StreamingBootstrap(statistic = statistic, num_resamples = num_resamples, columns = columns,
+	                                 random_state = random_state, max_bytes = max_bytes)
+	for chunk in chunks:
+		accumulator.update(chunk)
+
+	return accumulator.ci(conf_level = conf_level)
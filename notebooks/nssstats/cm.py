@@ -2,7 +2,81 @@ import numpy as np
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
-from sklearn.metrics import confusion_matrix
+
+def _label_codes(values, labels):
+    # Position of each value in labels (-1 if absent), comparing by value as == does, so that
+    # boolean predictions match labels [0, 1]. Values and labels are sorted together once.
+    values = np.asarray(values).ravel()
+    labels = np.asarray(labels)
+    unique, inverse = np.unique(np.concatenate([labels, values]), return_inverse = True)
+    inverse = inverse.ravel()
+    lookup = np.full(len(unique), -1, dtype = np.int64)
+    # Assigned in reverse so that a repeated label keeps its first position.
+    lookup[inverse[:len(labels)][::-1]] = np.arange(len(labels))[::-1]
+    return lookup[inverse[len(labels):]]
+
+def confusion_matrices(y_true, y_pred, labels, sample_weight = None):
+    """
+    Confusion matrices (rows actual, columns predicted, in the order of `labels`) without plotting.
+    y_pred is (nsamples,) for one matrix or (nsamples, nmodels) for a stack of shape
+    (nmodels, nclass, nclass), e.g. one column per model or threshold. Labels are coded once
+    and every matrix comes from a single np.bincount of true * nclass + pred. Observations whose
+    label is not in `labels` are left out, as in sklearn.metrics.confusion_matrix. Labels are
+    compared by value, so boolean predictions count against labels [0, 1]:
+
+    >>> confusion_matrices(np.array([0, 0, 1, 1, 1]), np.array([False, False, False, True, True]), labels = [0, 1])
+    array([[2, 0],
+           [1, 2]])
+    """
+    k = len(labels)
+    y_pred = np.asarray(y_pred)
+    columns = y_pred.reshape(len(y_pred), -1)
+    m = columns.shape[1]
+
+    true_codes = _label_codes(y_true, labels)
+    pred_codes = _label_codes(columns, labels).reshape(columns.shape)
+    weights = np.ones(len(true_codes)) if sample_weight is None else np.asarray(sample_weight, dtype = float)
+
+    valid = (true_codes[:, None] >= 0) & (pred_codes >= 0)
+    cells = np.arange(m) * k * k + true_codes[:, None] * k + pred_codes
+    counts = np.bincount(cells[valid], weights = np.broadcast_to(weights[:, None], cells.shape)[valid],
+                         minlength = m * k * k).reshape(m, k, k)
+    if sample_weight is None:
+        counts = counts.astype(np.int64)
+
+    return counts if y_pred.ndim == 2 else counts[0]
+
+def class_rates(cm):
+    """
+    Per-class rates for a confusion matrix or a stack of them (as from `confusion_matrices`),
+    each class taken in turn as the positive one: support, recall (true positive rate),
+    precision, false positive rate, specificity and F1, plus overall accuracy.
+    """
+    cm = np.asarray(cm, dtype = float)
+    total = cm.sum(axis = (-2, -1))
+    tp = np.diagonal(cm, axis1 = -2, axis2 = -1)
+    actual = cm.sum(axis = -1)
+    predicted = cm.sum(axis = -2)
+    fp = predicted - tp
+    negatives = total[..., None] - actual
+
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        recall = tp / actual
+        precision = tp / predicted
+        return {'support': actual, 'recall': recall, 'precision': precision, 'fpr': fp / negatives,
+                'specificity': 1 - fp / negatives, 'f1': 2 * precision * recall / (precision + recall),
+                'accuracy': tp.sum(axis = -1) / total}
+
+def _annotations(cm):
+    # Percent of each actual class, count / class total; the 2x2 case also names each cell.
+    cm_sum = np.sum(cm, axis=1, keepdims=True)
+    cm_perc = cm / cm_sum.astype(float) * 100
+    text = np.char.mod('%.1f%%\n', cm_perc) + np.char.mod('%d/', cm) + np.char.mod('%d', np.broadcast_to(cm_sum, cm.shape))
+    if cm.shape == (2, 2):
+        names = np.array([['True Negatives', 'False Positives'], ['False Negatives', 'True Positives']])
+        text = np.char.add(np.char.add(names, ':\n '), text)
+    # Empty off-diagonal cells are left blank.
+    return np.where((cm == 0) & ~np.eye(len(cm), dtype = bool), '', text).astype(object)
 
 def cm_analysis(y_true, y_pred, labels, filename = None, ymap=None, figsize=(10,10)):
     """
@@ -21,34 +95,11 @@ def cm_analysis(y_true, y_pred, labels, filename = None, ymap=None, figsize=(10,
 
     Modified from https://gist.github.com/hitvoice/36cf44689065ca9b927431546381a3f7#file-plot_confusion_matrix-py
     """
+    cm = confusion_matrices(y_true, y_pred, labels=labels)
     if ymap is not None:
-        y_pred = [ymap[yi] for yi in y_pred]
-        y_true = [ymap[yi] for yi in y_true]
         labels = [ymap[yi] for yi in labels]
-    cm = confusion_matrix(y_true, y_pred, labels=labels)
-    cm_sum = np.sum(cm, axis=1, keepdims=True)
-    cm_perc = cm / cm_sum.astype(float) * 100
-    annot = np.empty_like(cm).astype(object)
+    annot = _annotations(cm)
     annot_kws = {'fontsize': 12, 'fontweight' : 'bold'}
-    nrows, ncols = cm.shape
-    for i in range(nrows):
-        for j in range(ncols):
-            c = cm[i, j]
-            p = cm_perc[i, j]
-            if i == j == 0:
-                s = cm_sum[i]
-                annot[i, j] = 'True Negatives:\n %.1f%%\n%d/%d' % (p, c, s) 
-            elif i == j == 1:
-                s = cm_sum[i]
-                annot[i, j] = 'True Positives:\n %.1f%%\n%d/%d' % (p, c, s)
-            elif c == 0:
-                annot[i, j] = ''
-            elif i == 0 and j == 1:
-                s = cm_sum[i]
-                annot[i, j] = 'False Positives:\n %.1f%%\n%d/%d' % (p, c, s)
-            else:
-                s = cm_sum[i]
-                annot[i, j] = 'False Negatives:\n %.1f%%\n%d/%d' % (p, c, s)
     cm = pd.DataFrame(cm, index=labels, columns=labels)
     cm.index.name = 'Actual'
     cm.columns.name = 'Predicted'
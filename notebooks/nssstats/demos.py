@@ -1,109 +1,230 @@
+from functools import lru_cache
+
 import matplotlib.pyplot as plt
 import numpy as np
 from scipy.stats import norm, binom, poisson
 from scipy.stats import skewnorm
 
-def binom_normal_plot(n, p):
-    x_binom = np.arange(start = 0, stop = n+1)
-    y_binom = binom.pmf(k = x_binom, n = n, p = p) 
+DISTRIBUTIONS = {'binom': binom, 'poisson': poisson, 'norm': norm, 'skewnorm': skewnorm}
+
+@lru_cache(maxsize = 256)
+def _table(family, method, support, params):
+    x = np.arange(*support) if len(support) == 2 else np.linspace(*support)
+    grid = [np.asarray(value) for name, value in params if isinstance(value, tuple)]
+    if grid:
+        kwargs = {name: np.asarray(value)[:, None] if isinstance(value, tuple) else value for name, value in params}
+        y = getattr(DISTRIBUTIONS[family], method)(x[None, :], **kwargs)
+    else:
+        y = getattr(DISTRIBUTIONS[family], method)(x, **dict(params))
+    x.setflags(write = False)
+    y.setflags(write = False)
+    return x, y
+
+def distribution_table(family, support, method = None, **params):
+    """
+    Memoized values of a scipy.stats distribution ('binom', 'poisson', 'norm' or 'skewnorm') on
+    np.arange(*support) when support is (start, stop), or np.linspace(*support) when it is
+    (start, stop, num). method defaults to 'pmf' for the discrete families and 'pdf' otherwise.
+
+    Parameters given as sequences form a grid: the result has one row per grid point, all computed
+    in one broadcast call, e.g. the binomial pmf for every n from 0 to 100:
+
+        x, table = distribution_table('binom', (0, 101), n = range(101), p = 0.3)
+
+    Returns (x, values) as read-only arrays. The most recently used 256 tables are kept.
+    """
+    if method is None:
+        method = 'pmf' if family in ('binom', 'poisson') else 'pdf'
+    params = tuple(sorted((name, tuple(np.ravel(value).tolist()) if np.ndim(value) else value)
+                          for name, value in params.items()))
+    return _table(family, method, tuple(support), params)
+
+# Artists of the demos drawn on axes passed in by the caller, so later calls with the same axes
+# (e.g. from an interact callback under %matplotlib widget) update them in place and redraw.
+# They are kept on the (first) axes themselves, so they go when the figure does.
+_VIEW_ATTRIBUTE = '_nssstats_view'
+
+def _view(name, ax, fits = lambda view: True):
+    # The artists drawn by `name` on ax, or None if they need drawing. Without ax there is
+    # nothing to reuse; with axes holding something else, they are cleared first.
+    if ax is None:
+        return None
+    view = getattr(ax[0] if np.ndim(ax) else ax, _VIEW_ATTRIBUTE, None)
+    if view is not None and view['name'] == name and fits(view):
+        return view
+    for a in np.ravel(ax):
+        a.cla()
+    return None
+
+def _store_view(name, ax, view):
+    view['name'] = name
+    setattr(ax[0] if np.ndim(ax) else ax, _VIEW_ATTRIBUTE, view)
+    return view
+
+def _set_heights(bars, heights):
+    for i, bar in enumerate(bars):
+        visible = i < len(heights)
+        bar.set_visible(visible)
+        bar.set_height(heights[i] if visible else 0)
+
+def binom_normal_plot(n, p, ax = None):
+    """
+    Binomial pmf with its normal approximation. Pass ax to draw on existing axes; calling again
+    with the same axes updates the bars and curve in place instead of drawing a new figure.
+    """
+    x_binom, y_binom = distribution_table('binom', (0, n + 1), n = n, p = p)
+    x_norm, y_norm = distribution_table('norm', (-1, n+1, 200), loc = n*p, scale = np.sqrt(n*p*(1-p)))
     
-    x_norm = np.linspace(-1, n+1, num = 200)
-    y_norm = norm.pdf(x_norm, loc = n*p, scale = np.sqrt(n*p*(1-p)))
+    view = _view('binom_normal_plot', ax, lambda view: len(view['bars']) > n)
+    reused = view is not None
+    if view is None:
+        if ax is None:
+            fig, ax = plt.subplots(figsize = (8,6))
+        bars = ax.bar(np.arange(max(100, n) + 1), 0, label = 'Binomial Distribution')
+        line, = ax.plot(x_norm, y_norm, linewidth = 3, color = 'red', label = 'Normal Distribution')
+        ax.legend()
+        view = _store_view('binom_normal_plot', ax, {'bars': bars, 'line': line})
     
-    fig, ax = plt.subplots(figsize = (8,6))
+    _set_heights(view['bars'], y_binom)
+    view['line'].set_data(x_norm, y_norm)
+    # The limits autoscaling would give the bars alone (5% margins), as before.
+    width = n + 0.8
+    ax.set_xlim(-0.4 - 0.05*width, n + 0.4 + 0.05*width)
+    ax.set_ylim(0, 1.05 * np.nanmax(np.r_[y_binom, y_norm]))
+    if reused:
+        ax.figure.canvas.draw_idle()
+
+def poisson_pmf_plot(rate = 8, ax = None):
+    """Poisson pmf for the given rate; pass ax to draw on (and later update) existing axes."""
+    x, y = distribution_table('poisson', (0, 25), mu = rate)
     
-    plt.bar(x_binom, y_binom, label = 'Binomial Distribution')
-    xmin, xmax = plt.xlim()
-    plt.plot(x_norm, y_norm, linewidth = 3, color = 'red', label = 'Normal Distribution')
-    plt.legend()
-    plt.xlim(xmin, xmax);
-
-def poisson_pmf_plot(rate = 8):
-    fig, ax = plt.subplots(figsize = (10,5))
-    x = np.arange(0, 25)
-    y = poisson.pmf(x, mu = rate)
+    view = _view('poisson_pmf_plot', ax)
+    reused = view is not None
+    if view is None:
+        if ax is None:
+            fig, ax = plt.subplots(figsize = (10,5))
+        view = _store_view('poisson_pmf_plot', ax, {'bars': ax.bar(x, y)})
+        ax.set_ylim(0, 0.3)
+        ax.set_ylabel('density')
+        ax.set_xticks(x)
     
-    plt.bar(x, y)
-    plt.ylim(0, 0.3)
-    plt.title('Poisson Distribution, Rate = {}'.format(rate))
-    plt.ylabel('density')
-    plt.xticks(x)
+    _set_heights(view['bars'], y)
+    ax.set_title('Poisson Distribution, Rate = {}'.format(rate))
+    if reused:
+        ax.figure.canvas.draw_idle()
+
+def _binom_poisson_pmf(n, successes):
+    # The first 25 pmf values for a block of 256 trial counts at once, each with p = successes / n.
+    start = max(1, n - n % 256)
+    ns = range(start, start + 256)
+    x, table = distribution_table('binom', (0, 25), n = ns, p = [successes / k for k in ns])
+    return x[:min(n + 1, 25)], table[n - start, :min(n + 1, 25)]
 
-def binom_poisson(n, show_probabilities = False):
+def binom_poisson(n, show_probabilities = False, ax = None):
+    """
+    Binomial pmf with p = 8 / n above the Poisson pmf with rate 8. Pass a pair of axes as ax to
+    draw on (and later update) existing axes.
+    """
     successes = 8 
     
-    x_binom = np.arange(0, min(n + 1, 25))
-    y_binom = binom.pmf(x_binom, p = successes/n, n = n)
-    
-    x_poisson = np.arange(0, 25)
-    y_poisson = poisson.pmf(x_poisson, mu = successes)
+    x_binom, y_binom = _binom_poisson_pmf(n, successes)
+    x_poisson, y_poisson = distribution_table('poisson', (0, 25), mu = successes)
 
-    fig, ax = plt.subplots(nrows = 2, ncols=1, figsize = (10,6), sharey = True, sharex = True)
-    ax[0].bar(x_binom, y_binom)
-    ax[0].set_title('Binomial Distribution, {} Trials, p = {} / {} = {}'.format(n, successes, n, round(successes/n, 4)))
-    
+    view = _view('binom_poisson', ax)
+    reused = view is not None
+    if view is None:
+        if ax is None:
+            fig, ax = plt.subplots(nrows = 2, ncols=1, figsize = (10,6), sharey = True, sharex = True)
+        binom_bars = ax[0].bar(x_poisson, 0)
+        ax[1].bar(x_poisson, y_poisson)
+        ax[1].set_title('Poisson Distribution, rate = {}'.format(successes))
+        labels = [[a.annotate(text = '', xy = (x,0.01), rotation = 90, ha = 'center', va = 'bottom') for x in x_poisson]
+                  for a in ax]
+        for label, y in zip(labels[1], y_poisson):
+            label.set_text(str(round(y,4)))
+        view = _store_view('binom_poisson', ax, {'bars': binom_bars, 'labels': labels})
     
-    ax[1].bar(x_poisson, y_poisson)
-    ax[1].set_title('Poisson Distribution, rate = {}'.format(successes))
-    
-    if show_probabilities:
-        for x, y in zip(x_binom, y_binom):
-            ax[0].annotate(s = str(round(y,4)), xy = (x,0.01), rotation = 90, ha = 'center', va = 'bottom')
+    _set_heights(view['bars'], y_binom)
+    ax[0].set_title('Binomial Distribution, {} Trials, p = {} / {} = {}'.format(n, successes, n, round(successes/n, 4)))
+    for a in ax:
+        a.set_ylim(0, 1.05 * max(y_binom.max(), y_poisson.max()))
+    for i, label in enumerate(view['labels'][0]):
+        label.set_text(str(round(y_binom[i],4)) if i < len(y_binom) else '')
+    for label in view['labels'][0] + view['labels'][1]:
+        label.set_visible(show_probabilities)
+    if reused:
+        ax[0].figure.canvas.draw_idle()
 
-        for x, y in zip(x_poisson, y_poisson):
-            ax[1].annotate(s = str(round(y,4)), xy = (x,0.01), rotation = 90, ha = 'center', va = 'bottom');
+def _interval_fills(ax, x_min, x_max):
+    if x_min < x_max:
+        sections = [np.arange(x_min, x_max, 0.01)]
+    else:
+        sections = [np.arange(-3, x_max, 0.01), np.arange(x_min, 3, 0.01)]
+    return [ax.fill_between(section, norm.pdf(section), color = 'slateblue') for section in sections]
 
-def confidence_interval_plot(area = 0.95, sample_mean = 0):
-    x = np.linspace(norm.ppf(0.001), norm.ppf(0.999), 100)
-    fig, ax = plt.subplots(1, 1, figsize = (14,4))
-    ax.plot(x, norm.pdf(x),'r-', lw=3, alpha=1, label='norm pdf', color = 'black')
+def confidence_interval_plot(area = 0.95, sample_mean = 0, ax = None):
+    """Confidence interval around a sample mean; pass ax to draw on (and later update) existing axes."""
     x_min = norm.ppf((1-area) / 2)
     x_max = norm.ppf(1 - (1-area) / 2)
-    if x_min < x_max:
-        section = np.arange(x_min, x_max, 0.01)
-        plt.fill_between(section,norm.pdf(section), color = 'slateblue')
-    else:
-        section_1 = np.arange(-3, x_max, 0.01)
-        plt.fill_between(section_1, norm.pdf(section_1), color = 'slateblue')
-        section_2 = np.arange(x_min, 3, 0.01)
-        plt.fill_between(section_2, norm.pdf(section_2), color = 'slateblue')
-    if x_min != -3:
-        plt.vlines(x = x_min, ymin = 0, ymax = norm.pdf(x_min), lw = 3, color = 'black')
-        #plt.xticks(ticks = [x_min], labels = [f'z = {x_min}'], fontsize = 14)
-        plt.annotate(s = f'{round(x_min,2)}', xy = (x_min, -0.01), fontsize = 14, fontweight = 'bold', 
-                     va = 'top', ha = 'center', color = 'orangered')
-    if x_max != 3:
-        plt.vlines(x = x_max, ymin = 0, ymax = norm.pdf(x_max), lw = 3, color = 'black')
-        #plt.xticks(ticks = [x_max], labels = [f'z = {x_max}'], fontsize = 14)
-        plt.annotate(s = f'{round(x_max,2)}', xy = (x_max, -0.01), fontsize = 14, fontweight = 'bold', 
-                     va = 'top', ha = 'center', color = 'orangered')
-        
-    plt.annotate(s = f'Area = {area}', xy = (0, 0.01), fontsize = 14,
-                va = 'bottom', ha = 'center', fontweight = 'bold', color = 'yellow')
-    if True:
-        plt.plot([sample_mean + x_min, sample_mean - 0.2], [-0.1, -0.1], lw = 3, color = 'red')
-        plt.plot([sample_mean + 0.2, sample_mean + x_max], [-0.1, -0.1], lw = 3, color = 'red')
-        plt.plot([sample_mean + x_min, sample_mean + x_min], [-0.09, -0.11], lw = 3, color = 'red')
-        plt.plot([sample_mean + x_max, sample_mean + x_max], [-0.09, -0.11], lw = 3, color = 'red')
-        plt.plot([sample_mean, sample_mean], [0, -0.06], lw = 3, linestyle = '-', color = 'black')
-        plt.annotate(s = '$\\overline{x}$', xy = (sample_mean, -0.1), 
-                     va = 'center', ha = 'center',
-                     fontsize = 14, fontweight = 'bold')
-        plt.annotate(s = r'0', xy = (0, -0.01), fontsize = 14, fontweight = 'bold', 
-                     va = 'top', ha = 'center', color = 'orangered')
+    
+    view = _view('confidence_interval_plot', ax)
+    reused = view is not None
+    if view is None:
+        x, y = distribution_table('norm', (norm.ppf(0.001), norm.ppf(0.999), 100))
+        if ax is None:
+            fig, ax = plt.subplots(1, 1, figsize = (14,4))
+        ax.plot(x, y,'r-', lw=3, alpha=1, label='norm pdf', color = 'black')
+        edges = [ax.vlines(x = 0, ymin = 0, ymax = 0, lw = 3, color = 'black') for i in range(2)]
+        edge_labels = [ax.annotate(text = '', xy = (0, -0.01), fontsize = 14, fontweight = 'bold', 
+                                   va = 'top', ha = 'center', color = 'orangered') for i in range(2)]
+        area_label = ax.annotate(text = '', xy = (0, 0.01), fontsize = 14,
+                                 va = 'bottom', ha = 'center', fontweight = 'bold', color = 'yellow')
+        interval = [ax.plot([], [], lw = 3, color = 'red')[0] for i in range(4)]
+        center, = ax.plot([], [], lw = 3, linestyle = '-', color = 'black')
+        center_label = ax.annotate(text = '$\\overline{x}$', xy = (0, -0.1), 
+                                   va = 'center', ha = 'center',
+                                   fontsize = 14, fontweight = 'bold')
+        ax.annotate(text = r'0', xy = (0, -0.01), fontsize = 14, fontweight = 'bold', 
+                    va = 'top', ha = 'center', color = 'orangered')
         
-    plt.plot([0, 0], [-0.15, 0.4], linestyle = '--', color = 'black')
-    plt.annotate(s = '$\mu$', xy = (0, -0.15), fontsize = 14, ha = 'center', va = 'top')
+        ax.plot([0, 0], [-0.15, 0.4], linestyle = '--', color = 'black')
+        ax.annotate(text = '$\\mu$', xy = (0, -0.15), fontsize = 14, ha = 'center', va = 'top')
         
-    plt.hlines(y = 0, xmin = -3, xmax = 3)
-    plt.yticks([])
-    plt.xticks([])
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    plt.ylim(plt.ylim()[0] - 0.05, plt.ylim()[1])
-    plt.xlim(-5.5, 5.5);
+        ax.hlines(y = 0, xmin = -3, xmax = 3)
+        ax.set_yticks([])
+        ax.set_xticks([])
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        ax.spines['bottom'].set_visible(False)
+        ax.spines['left'].set_visible(False)
+        ax.set_ylim(ax.get_ylim()[0] - 0.05, ax.get_ylim()[1])
+        ax.set_xlim(-5.5, 5.5)
+        view = _store_view('confidence_interval_plot', ax, {'fills': [], 'edges': edges,
+                                                            'edge_labels': edge_labels, 'area_label': area_label,
+                                                            'interval': interval, 'center': center,
+                                                            'center_label': center_label})
+    
+    for fill in view['fills']:
+        fill.remove()
+    view['fills'] = _interval_fills(ax, x_min, x_max)
+    for edge, label, x in zip(view['edges'], view['edge_labels'], [x_min, x_max]):
+        edge.set_segments([[(x, 0), (x, norm.pdf(x))]])
+        label.xy = (x, -0.01)
+        label.set_position((x, -0.01))
+        label.set_text(f'{round(x,2)}')
+    view['area_label'].set_text(f'Area = {area}')
+    
+    segments = [([sample_mean + x_min, sample_mean - 0.2], [-0.1, -0.1]),
+                ([sample_mean + 0.2, sample_mean + x_max], [-0.1, -0.1]),
+                ([sample_mean + x_min, sample_mean + x_min], [-0.09, -0.11]),
+                ([sample_mean + x_max, sample_mean + x_max], [-0.09, -0.11])]
+    for line, segment in zip(view['interval'], segments):
+        line.set_data(*segment)
+    view['center'].set_data([sample_mean, sample_mean], [0, -0.06])
+    view['center_label'].xy = (sample_mean, -0.1)
+    view['center_label'].set_position((sample_mean, -0.1))
+    if reused:
+        ax.figure.canvas.draw_idle()
 
 
 def bootstrap_confidence_interval_plot(area = 0.95, sample_mean = 0, a = 5):
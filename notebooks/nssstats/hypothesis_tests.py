@@ -0,0 +1,68 @@
+import numpy as np
+from scipy.stats import norm, t
+
+class TestResult():
+    """
+    Test statistics with their reference distribution: Student's t with `df` degrees of freedom,
+    or the standard normal when df is None. Everything is an array when many tests are run at
+    once; index a result to get a single test, e.g. for `nssstats.plots.hypot_plot`.
+    """
+    def __init__(self, statistic, df = None):
+        self.statistic = statistic
+        self.df = df
+
+    def __len__(self):
+        return np.size(self.statistic)
+
+    def __getitem__(self, index):
+        return TestResult(np.asarray(self.statistic)[index], None if self.df is None else np.asarray(self.df)[index])
+
+    def pdf(self, x):
+        return norm.pdf(x) if self.df is None else t.pdf(x, df = self.df)
+
+    def _sf(self, x):
+        return norm.sf(x) if self.df is None else t.sf(x, df = self.df)
+
+    def p_value(self, alternative = 'two-sided'):
+        if alternative == 'larger':
+            return self._sf(self.statistic)
+        if alternative == 'smaller':
+            return self._sf(-np.asarray(self.statistic))
+        if alternative == 'two-sided':
+            return 2 * self._sf(np.abs(self.statistic))
+        raise ValueError("Invalid entry to 'alternative' input. Alternative "
+                         "must be 'larger', 'smaller' or 'two-sided'.")
+
+def ttest_1samp_moments(mean, std, nobs, popmean = 0):
+    """One-sample t tests from means, sample standard deviations (ddof = 1) and counts."""
+    mean, std, nobs = np.asarray(mean, dtype = float), np.asarray(std, dtype = float), np.asarray(nobs, dtype = float)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return TestResult((mean - popmean) / (std / np.sqrt(nobs)), df = nobs - 1)
+
+def ttest_welch_moments(mean1, std1, nobs1, mean2, std2, nobs2):
+    """Welch two-sample t tests (unequal variances) from each group's mean, sample standard deviation and count."""
+    mean1, std1, nobs1, mean2, std2, nobs2 = (np.asarray(a, dtype = float) for a in (mean1, std1, nobs1, mean2, std2, nobs2))
+    var1, var2 = std1**2 / nobs1, std2**2 / nobs2
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        df = (var1 + var2)**2 / (var1**2 / (nobs1 - 1) + var2**2 / (nobs2 - 1))
+        return TestResult((mean1 - mean2) / np.sqrt(var1 + var2), df = df)
+
+def proportions_ztest_counts(count1, nobs1, count2, nobs2):
+    """Two-proportion z tests with the pooled proportion, as statsmodels' proportions_ztest, from success counts."""
+    count1, nobs1, count2, nobs2 = (np.asarray(a, dtype = float) for a in (count1, nobs1, count2, nobs2))
+    pooled = (count1 + count2) / (nobs1 + nobs2)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return TestResult((count1 / nobs1 - count2 / nobs2) / np.sqrt(pooled * (1 - pooled) * (1 / nobs1 + 1 / nobs2)))
+
+def _moments(data, axis):
+    data = np.asarray(data, dtype = float)
+    nobs = np.sum(~np.isnan(data), axis = axis)
+    return np.nanmean(data, axis = axis), np.nanstd(data, axis = axis, ddof = 1), nobs
+
+def ttest_1samp_batch(data, popmean = 0, axis = 0):
+    """One-sample t test of every column (or slice along `axis`) of data; missing values are ignored."""
+    return ttest_1samp_moments(*_moments(data, axis), popmean = popmean)
+
+def ttest_welch_batch(data1, data2, axis = 0):
+    """Welch two-sample t tests comparing data1 and data2 column by column (or along `axis`)."""
+    return ttest_welch_moments(*_moments(data1, axis), *_moments(data2, axis))
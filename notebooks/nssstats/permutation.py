@@ -1,31 +1,390 @@
+from itertools import combinations
+from math import comb
+
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
+from scipy.stats import beta, rankdata
 
-def generate_permutations(values, label_count, num_permutations = 10000, statistic = np.mean, **kwargs):
-    permutation_differences = [None] * num_permutations
-    for i in range(num_permutations):
-        np.random.shuffle(values)
-        permutation_differences[i] = statistic(values[:label_count], **kwargs) - statistic(values[label_count:], **kwargs)
-        
-    return permutation_differences
+from .bootstrap import _chunk_size, _seed_sequence, _vectorizes
+
+def _permutation_blocks(n, num_permutations, chunk_size, random_state = None):
+    # Yields (rows, n) blocks of permutation indices; the caller's data is never shuffled.
+    rng = np.random.default_rng(_seed_sequence(random_state))
+    identity = np.broadcast_to(np.arange(n), (chunk_size, n))
+    for start in range(0, num_permutations, chunk_size):
+        size = min(chunk_size, num_permutations - start)
+        yield start, rng.permuted(identity[:size], axis = 1)
+
+def generate_permutations(values, label_count, num_permutations = 10000, statistic = np.mean, chunk_size = None,
+                          max_bytes = 2**27, random_state = None, **kwargs):
+    """
+    Return an array of statistic(first label_count values) - statistic(remaining values)
+    over `num_permutations` random permutations of `values`, which is left unchanged.
+
+    Permutations are drawn as index blocks of `chunk_size` rows (by default as many as fit in
+    `max_bytes`), and statistics that accept `axis` are evaluated on a whole block at once.
+    For np.mean only the smaller group is summed, since the other group's sum follows from the total.
+    """
+    values = np.asarray(values)
+    n = len(values)
+    chunk_size = _chunk_size(values, chunk_size, max_bytes)
+
+    mean_shortcut = statistic is np.mean and not kwargs
+    if mean_shortcut:
+        total = values.sum()
+        first_is_smaller = label_count <= n - label_count
+    else:
+        vectorized = _vectorizes(statistic, values, **kwargs)
+
+    permutation_differences = np.empty(num_permutations)
+    for start, indices in _permutation_blocks(n, num_permutations, chunk_size, random_state):
+        stop = start + len(indices)
+        if mean_shortcut:
+            if first_is_smaller:
+                first_sum = values[indices[:, :label_count]].sum(axis = 1)
+            else:
+                first_sum = total - values[indices[:, label_count:]].sum(axis = 1)
+            permutation_differences[start:stop] = first_sum / label_count - (total - first_sum) / (n - label_count)
+            continue
+
+        permuted = values[indices]
+        if vectorized:
+            permutation_differences[start:stop] = (statistic(permuted[:, :label_count], axis = 1, **kwargs)
+                                                   - statistic(permuted[:, label_count:], axis = 1, **kwargs))
+        else:
+            for i, permutation in enumerate(permuted):
+                permutation_differences[start + i] = (statistic(permutation[:label_count], **kwargs)
+                                                      - statistic(permutation[label_count:], **kwargs))
 
-def generate_permutations_correlation(A, B, num_permutations = 10000):
-    permutation_differences = [None] * num_permutations
-    for i in range(num_permutations):
-        np.random.shuffle(B)
-        permutation_differences[i] = np.corrcoef(A, B)[0,1]
-        
     return permutation_differences
 
-def permutation_test_p(permutation_differences, observed_difference, alternative = 'two-sided'):
+def _enumerated_differences(values, label_count, statistic, **kwargs):
+    # Every split of values into a first group of label_count and the rest, one row per split.
+    n = len(values)
+    first = np.array(list(combinations(range(n), label_count)), dtype = np.intp).reshape(-1, label_count)
+    in_first = np.zeros((len(first), n), dtype = bool)
+    in_first[np.arange(len(first))[:, None], first] = True
+    rest = np.nonzero(~in_first)[1].reshape(len(first), n - label_count)
+
+    if _vectorizes(statistic, values, **kwargs):
+        return statistic(values[first], axis = 1, **kwargs) - statistic(values[rest], axis = 1, **kwargs)
+    return np.array([statistic(values[a], **kwargs) - statistic(values[b], **kwargs) for a, b in zip(first, rest)])
+
+def _integer_scale(values):
+    # Scale (1 or 2, for midranks) that makes every value an integer, or None.
+    for scale in (1, 2):
+        if np.all(values * scale == np.round(values * scale)):
+            return scale
+    return None
+
+def _sum_distribution(values, label_count, scale):
+    # Counts of first-group sums over all splits, by dynamic programming over (group size, sum):
+    # adding a value v moves every subset of size k and sum s to size k + 1 and sum s + v.
+    integers = np.round(values * scale).astype(np.int64)
+    offset = integers.min()
+    integers = integers - offset
+    max_sum = int(np.sort(integers)[-label_count:].sum()) if label_count else 0
+    counts = np.zeros((label_count + 1, max_sum + 1))
+    counts[0, 0] = 1
+    for v in integers:
+        counts[1:, v:] += counts[:-1, :max_sum + 1 - v]
+        # Only the relative counts matter, so rescale before float64 would overflow.
+        if counts.max() > 1e280:
+            counts /= counts.max()
+    sums = np.nonzero(counts[label_count])[0]
+    return (sums + offset * label_count) / scale, counts[label_count, sums]
+
+def permutation_distribution(values, label_count, num_permutations = 10000, statistic = np.mean, exact = None,
+                             ranks = False, max_enumerate = 100000, max_dp_ops = 10**8, random_state = None, **kwargs):
+    """
+    Distribution of statistic(first label_count values) - statistic(remaining values) under permutation.
+
+    Returns differences and weights. When there are at most `max_enumerate` ways to split the data,
+    every split is enumerated. Otherwise, for np.mean or np.sum of integer data (or ranks), the exact
+    distribution of the group sum is built by dynamic programming if that takes at most `max_dp_ops`
+    steps. Failing both, `num_permutations` random permutations are drawn and weights is None.
+    exact = True raises an error instead of falling back to Monte Carlo, and exact = False always
+    uses it. With ranks = True the values are replaced by their (mid)ranks, giving a rank-sum test.
+    Pass both to `permutation_test_p`.
+    """
+    values = np.asarray(values, dtype = float)
+    if ranks:
+        values = rankdata(values)
+    n = len(values)
+
+    if exact is not False:
+        if comb(n, label_count) <= max_enumerate:
+            differences = _enumerated_differences(values, label_count, statistic, **kwargs)
+            return differences, np.full(len(differences), 1 / len(differences))
+
+        scale = _integer_scale(values)
+        if statistic in (np.mean, np.sum) and not kwargs and scale is not None \
+                and n * label_count * scale * np.ptp(values) * label_count <= max_dp_ops:
+            sums, counts = _sum_distribution(values, label_count, scale)
+            total = values.sum()
+            if statistic is np.mean:
+                differences = sums / label_count - (total - sums) / (n - label_count)
+            else:
+                differences = sums - (total - sums)
+            return differences, counts / counts.sum()
+
+        if exact:
+            raise ValueError("The exact permutation distribution is too large to compute; "
+                             "raise max_enumerate or max_dp_ops, or use exact = False.")
+
+    return generate_permutations(values, label_count, num_permutations = num_permutations, statistic = statistic,
+                                 random_state = random_state, **kwargs), None
+
+def _standardize(values):
+    # Centered and scaled so that the dot product of two standardized columns is their correlation.
+    centered = values - values.mean(axis = 0)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return centered / np.sqrt(np.sum(centered**2, axis = 0))
+
+def generate_permutations_correlation(A, B, num_permutations = 10000, chunk_size = None, max_bytes = 2**27,
+                                      random_state = None):
+    """
+    Return the correlations of A with B over `num_permutations` random permutations, without
+    changing either input. B may be 2-D (one column per variable), in which case every column is
+    tested against A with the same permutations and the result has one column per column of B.
+
+    A and B are standardized once, so each block of permutations is a single gather of A
+    followed by a matrix product with B.
+    """
+    a = _standardize(np.asarray(A, dtype = float))
+    B = np.asarray(B, dtype = float)
+    b = _standardize(B if B.ndim == 2 else B[:, None])
+    n = len(a)
+    chunk_size = _chunk_size(a, chunk_size, max_bytes)
+
+    # Permuting A against B gives the same distribution as permuting B against A.
+    permutation_correlations = np.empty((num_permutations, b.shape[1]))
+    for start, indices in _permutation_blocks(n, num_permutations, chunk_size, random_state):
+        permutation_correlations[start:start + len(indices)] = a[indices] @ b
+
+    return permutation_correlations if B.ndim == 2 else permutation_correlations[:, 0]
+
+class PermutationNull():
+    """
+    Permutation null distribution sorted once, for scoring many observed differences against it.
+
+    `p_value` answers 'larger', 'smaller' and 'two-sided' queries for a scalar or an array of
+    observed differences with binary searches, and `quantile` / `critical_value` give cut-offs.
+    `weights` are the optional weights returned by `permutation_distribution`.
+    """
+    def __init__(self, permutation_differences, weights = None):
+        differences = np.asarray(permutation_differences, dtype = float)
+        weights = np.ones(len(differences)) if weights is None else np.asarray(weights, dtype = float)
+        self.weighted = len(np.unique(weights)) > 1
+
+        order = np.argsort(differences)
+        self.differences = differences[order]
+        self.cumulative = np.r_[0, np.cumsum(weights[order])]
+
+        order = np.argsort(np.abs(differences))
+        self.abs_differences = np.abs(differences)[order]
+        self.abs_cumulative = np.r_[0, np.cumsum(weights[order])]
+
+    def p_value(self, observed_difference, alternative = 'two-sided'):
+        observed = np.asarray(observed_difference, dtype = float)
+        # Allow for rounding so that permutations tied with the observed difference count as extreme.
+        tolerance = 1e-12 * np.maximum(1, np.abs(observed))
+        total = self.cumulative[-1]
+
+        if alternative == 'larger':
+            extreme = total - self.cumulative[np.searchsorted(self.differences, observed - tolerance, side = 'left')]
+        elif alternative == 'smaller':
+            extreme = self.cumulative[np.searchsorted(self.differences, observed + tolerance, side = 'right')]
+        elif alternative == 'two-sided':
+            index = np.searchsorted(self.abs_differences, np.abs(observed) - tolerance, side = 'left')
+            extreme = total - self.abs_cumulative[index]
+        else:
+            raise ValueError("Invalid entry to 'alternative' input. Alternative "
+                             "must be 'larger', 'smaller' or 'two-sided'.")
+
+        p = extreme / total
+        return p if p.ndim else float(p)
+
+    def quantile(self, q):
+        # Plain np.quantile for equally weighted permutations, the weighted inverse CDF otherwise.
+        if not self.weighted:
+            return np.quantile(self.differences, q)
+        index = np.searchsorted(self.cumulative[1:], np.asarray(q) * self.cumulative[-1], side = 'left')
+        return self.differences[np.minimum(index, len(self.differences) - 1)]
+
+    def critical_value(self, alpha = 0.05, alternative = 'two-sided'):
+        if alternative == 'larger':
+            return self.quantile(1 - alpha)
+        if alternative == 'smaller':
+            return self.quantile(alpha)
+        if not self.weighted:
+            return np.quantile(self.abs_differences, 1 - alpha)
+        index = np.searchsorted(self.abs_cumulative[1:], (1 - alpha) * self.abs_cumulative[-1], side = 'left')
+        return self.abs_differences[min(index, len(self.abs_differences) - 1)]
+
+def permutation_test_p(permutation_differences, observed_difference, alternative = 'two-sided', weights = None):
+    """
+    P-value of `observed_difference` (a number or an array) against a permutation distribution,
+    given as differences (with optional weights) or as a `PermutationNull` to reuse its sort.
+    """
+    if not isinstance(permutation_differences, PermutationNull):
+        permutation_differences = PermutationNull(permutation_differences, weights)
+
+    return permutation_differences.p_value(observed_difference, alternative = alternative)
+
+def _is_extreme(permutation_differences, observed_difference, alternative = 'two-sided'):
+    # Same comparisons, and the same allowance for rounding, as PermutationNull.p_value.
+    tolerance = 1e-12 * max(1, np.abs(observed_difference))
     if alternative == 'larger':
-        return len([x for x in permutation_differences if x >= observed_difference]) / len(permutation_differences)
-        
+        return permutation_differences >= observed_difference - tolerance
     if alternative == 'smaller':
-        return len([x for x in permutation_differences if x <= observed_difference]) / len(permutation_differences)
-    
+        return permutation_differences <= observed_difference + tolerance
     if alternative == 'two-sided':
-        return len([x for x in permutation_differences if x <= -np.abs(observed_difference) or x >= np.abs(observed_difference)]) / len(permutation_differences)
+        return np.abs(permutation_differences) >= np.abs(observed_difference) - tolerance
+    raise ValueError("Invalid entry to 'alternative' input. Alternative "
+                     "must be 'larger', 'smaller' or 'two-sided'.")
+
+def sequential_permutation_test(values, label_count, observed_difference = None, alternative = 'two-sided',
+                                statistic = np.mean, h = 10, alpha = None, confidence = 0.99, batch_size = 100,
+                                max_permutations = 10000, random_state = None, **kwargs):
+    """
+    Permutation p-value that stops as soon as the answer is clear (Besag and Clifford, 1991).
+
+    Permutations are drawn in batches of `batch_size`. Sampling stops at the permutation giving the
+    h-th difference at least as extreme as the observed one, with p = h / permutations used. If
+    `alpha` is given it also stops once the Clopper-Pearson interval for p at level `confidence` lies
+    entirely above or below alpha. Otherwise it runs to `max_permutations`. When it stops before the
+    h-th exceedance, p = (exceedances + 1) / (permutations + 1), which counts the observed labelling
+    as one of the permutations and so is never 0.
+    The observed difference defaults to the one between the first label_count values and the rest.
+
+    Returns the p-value and a dict with its Monte Carlo standard error, the number of permutations
+    used, the number of exceedances and the reason for stopping.
+    """
+    values = np.asarray(values)
+    if observed_difference is None:
+        observed_difference = statistic(values[:label_count], **kwargs) - statistic(values[label_count:], **kwargs)
+    batch_seeds = _seed_sequence(random_state).spawn(int(np.ceil(max_permutations / batch_size)))
+
+    exceedances, num_permutations, stopped = 0, 0, 'max_permutations'
+    for seed in batch_seeds:
+        size = min(batch_size, max_permutations - num_permutations)
+        permutation_differences = generate_permutations(values, label_count, num_permutations = size,
+                                                        statistic = statistic, random_state = seed, **kwargs)
+        running = exceedances + np.cumsum(_is_extreme(permutation_differences, observed_difference, alternative))
+        if running[-1] >= h:
+            num_permutations += int(np.argmax(running >= h)) + 1
+            exceedances, stopped = h, 'exceedances'
+            break
+        exceedances, num_permutations = int(running[-1]), num_permutations + size
+
+        if alpha is not None:
+            tail = (1 - confidence) / 2
+            lower = beta.ppf(tail, exceedances, num_permutations - exceedances + 1) if exceedances else 0
+            upper = beta.ppf(1 - tail, exceedances + 1, num_permutations - exceedances)
+            if upper < alpha or lower > alpha:
+                stopped = 'alpha'
+                break
+
+    if stopped == 'exceedances':
+        p = exceedances / num_permutations
+    else:
+        p = (exceedances + 1) / (num_permutations + 1)
+    result = {'se': float(np.sqrt(p * (1 - p) / num_permutations)), 'num_permutations': num_permutations,
+              'exceedances': exceedances, 'stopped': stopped}
+
+    return p, result
+
+def _group_statistics(in_group, X, squares, n_group, total, total_squares, statistic):
+    # Per-feature group statistic for every row of a 0/1 membership block, from column sums.
+    n = len(X)
+    sums = in_group @ X
+    means_a = sums / n_group
+    means_b = (total - sums) / (n - n_group)
+    if statistic == 'mean':
+        return means_a - means_b
+    sums_squares = in_group @ squares
+    variances_a = (sums_squares - sums * means_a) / (n_group - 1)
+    variances_b = (total_squares - sums_squares - (total - sums) * means_b) / (n - n_group - 1)
+    with np.errstate(divide = 'ignore', invalid = 'ignore'):
+        return (means_a - means_b) / np.sqrt(variances_a / n_group + variances_b / (n - n_group))
+
+def multi_feature_permutation_test(values, labels, group = None, num_permutations = 10000, statistic = 't',
+                                   alternative = 'two-sided', adjustment = 'maxT', chunk_size = None,
+                                   max_bytes = 2**27, random_state = None):
+    """
+    Permutation tests of many features at once, with family-wise error adjusted p-values.
+
+    `values` is an (observations x features) array or DataFrame and `labels` splits the observations
+    into two groups; `group` is the label of the first group (by default the first in sorted order).
+    The statistic is the Welch t statistic ('t') or the difference in means ('mean') of the first
+    group minus the second. Each permutation of the labels is applied to every feature at once, as a
+    matrix product of a block of permuted group memberships with the columns.
+
+    `adjustment` is 'maxT' (single-step Westfall-Young, using the largest statistic across features
+    in each permutation, so only meaningful for 'mean' when the features share a scale) or 'minP'
+    (using the smallest per-feature p-value). Permutations are processed in blocks of `chunk_size`
+    rows, by default as many as fit in `max_bytes` with every per-feature temporary counted, so
+    'maxT' needs memory for one block only. 'minP' keeps every permutation statistic, and then
+    their p-values: two num_permutations x features arrays of float64, whatever max_bytes is.
+    Returns a DataFrame with the observed statistic, the raw p-value and the adjusted p-value of each feature.
+    """
+    if adjustment not in ('maxT', 'minP'):
+        raise ValueError("Invalid entry to 'adjustment' input. Adjustment must be 'maxT' or 'minP'.")
+    features = values.columns if isinstance(values, pd.DataFrame) else np.arange(np.shape(values)[1])
+    X = np.asarray(values, dtype = float)
+    X = X - X.mean(axis = 0)
+    squares = X**2
+    total, total_squares = X.sum(axis = 0), squares.sum(axis = 0)
+
+    labels = np.asarray(labels)
+    if group is None:
+        group = np.unique(labels)[0]
+    in_group = (labels == group).astype(float)
+    n_group = in_group.sum()
+
+    def score(statistics):
+        if alternative == 'larger':
+            return statistics
+        if alternative == 'smaller':
+            return -statistics
+        return np.abs(statistics)
+
+    observed = _group_statistics(in_group[None, :], X, squares, n_group, total, total_squares, statistic)[0]
+    observed_score = score(observed)
+
+    exceedances = np.zeros(X.shape[1])
+    max_scores = np.empty(num_permutations)
+    all_scores = np.empty((num_permutations, X.shape[1])) if adjustment == 'minP' else None
+    if chunk_size is None:
+        # Per permutation: the indices and gathered memberships (n each), plus the per-feature
+        # arrays of a block: sums, means, variances, statistics, scores and comparisons.
+        temporaries = 4 if statistic == 'mean' else 9
+        row_bytes = (2 * len(X) + temporaries * X.shape[1]) * X.itemsize
+        chunk_size = min(1024, max_bytes // row_bytes)
+    chunk_size = max(1, int(chunk_size))
+    for start, indices in _permutation_blocks(len(X), num_permutations, chunk_size, random_state):
+        stop = start + len(indices)
+        scores = score(_group_statistics(in_group[indices], X, squares, n_group, total, total_squares, statistic))
+        exceedances += np.sum(scores >= observed_score, axis = 0)
+        max_scores[start:stop] = np.max(scores, axis = 1)
+        if all_scores is not None:
+            all_scores[start:stop] = scores
+
+    p_values = exceedances / num_permutations
+    if adjustment == 'maxT':
+        adjusted = PermutationNull(max_scores).p_value(observed_score, alternative = 'larger')
+    else:
+        # Each permutation's p-value for every feature is the share of permutations scoring at least as high.
+        permutation_p = np.empty_like(all_scores)
+        for j in range(all_scores.shape[1]):
+            column = np.sort(all_scores[:, j])
+            permutation_p[:, j] = 1 - np.searchsorted(column, all_scores[:, j], side = 'left') / num_permutations
+        adjusted = PermutationNull(permutation_p.min(axis = 1)).p_value(p_values, alternative = 'smaller')
+
+    return pd.DataFrame({'feature': features, 'statistic': observed, 'p_value': p_values,
+                         'p_adjusted': np.maximum(adjusted, p_values)})
 
 def permutation_test_plot(permutation_differences, observed_difference, alternative = 'two-sided'):
     N, bins, patches = plt.hist(permutation_differences, bins = 40)
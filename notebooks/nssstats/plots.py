@@ -1,41 +1,112 @@
 import numpy as np
+import pandas as pd
 import matplotlib.pyplot as plt
 import statsmodels.api as sm
-from scipy.stats import t
-from scipy.stats import ttest_1samp
-from scipy.stats import ttest_ind
-from statsmodels.stats.proportion import proportions_ztest
 from scipy.stats import norm
 from statsmodels.stats.proportion import proportion_confint
 from matplotlib.patches import Rectangle
+from matplotlib.colors import LinearSegmentedColormap, LogNorm, to_rgba
+
+from .summary import summarize
+from .hypothesis_tests import ttest_1samp_batch, ttest_welch_batch, proportions_ztest_counts
+
+# Above this many points the scatter-heavy plots switch to a density image or a stratified sample.
+SCATTER_MAX_POINTS = 100000
+# Bins per axis of the density image, and of the grid used for stratified sampling.
+SCATTER_PIXELS = 300
+
+def _grid_cells(x, y, pixels):
+    def bin_ids(values):
+        edges = np.linspace(np.min(values), np.max(values), pixels + 1)
+        return np.clip(np.searchsorted(edges, values, side = 'right') - 1, 0, pixels - 1)
+    return bin_ids(x) * pixels + bin_ids(y)
+
+def _stratified_sample(x, y, max_points, pixels, rng):
+    # Keep at most `cap` random points from every grid cell, with `cap` as large as max_points allows,
+    # so dense regions are thinned while sparse ones (and outliers) keep all their points.
+    cells = _grid_cells(x, y, pixels)
+    order = rng.permutation(len(x))
+    order = order[np.argsort(cells[order], kind = 'stable')]
+    counts = np.bincount(cells, minlength = pixels * pixels)
+    first = np.r_[0, np.cumsum(counts)[:-1]]
+    rank = np.arange(len(x)) - first[cells[order]]
+
+    low, high = 1, counts.max()
+    while low < high:
+        cap = (low + high + 1) // 2
+        if np.minimum(counts, cap).sum() <= max_points:
+            low = cap
+        else:
+            high = cap - 1
+    return order[rank < low]
+
+def scatter_points(x, y, render = 'auto', max_points = None, pixels = None, **kwargs):
+    """
+    plt.scatter that copes with very many points. With render = 'auto', up to `max_points`
+    (default SCATTER_MAX_POINTS) points are scattered as usual; above that, data with a few
+    distinct y values (strip plots) is thinned to a stratified sample and other data is drawn as a
+    2-D histogram image with `pixels` (default SCATTER_PIXELS) bins per axis, shaded in the
+    scatter color on a log scale. render = 'scatter', 'sample' or 'density' forces one of these.
+    """
+    x = np.asarray(x, dtype = float)
+    y = np.asarray(y, dtype = float)
+    max_points = SCATTER_MAX_POINTS if max_points is None else max_points
+    pixels = SCATTER_PIXELS if pixels is None else pixels
+
+    if render == 'auto':
+        if len(x) <= max_points:
+            render = 'scatter'
+        else:
+            render = 'sample' if len(np.unique(y)) <= 10 else 'density'
+
+    if render == 'density':
+        counts, x_edges, y_edges = np.histogram2d(x, y, bins = pixels)
+        color = kwargs.get('color', kwargs.get('c', 'C0'))
+        cmap = LinearSegmentedColormap.from_list('density', [to_rgba(color, 0.2), to_rgba(color, 1)])
+        return plt.pcolormesh(x_edges, y_edges, np.ma.masked_equal(counts.T, 0), cmap = cmap, norm = LogNorm(),
+                              zorder = kwargs.get('zorder'), label = kwargs.get('label'), rasterized = True)
+
+    if render == 'sample' and len(x) > max_points:
+        keep = _stratified_sample(x, y, max_points, pixels, np.random.default_rng(0))
+        x, y = x[keep], y[keep]
+        kwargs['rasterized'] = True
+
+    return plt.scatter(x, y, **kwargs)
+
+def _summary_hist(summary, **kwargs):
+    # plt.hist of a summarized column from its cached histogram; the other hist keyword arguments still apply.
+    counts, edges = summary.histogram(bins = kwargs.pop('bins', plt.rcParams['hist.bins']), range = kwargs.pop('range', None))
+    return plt.hist(edges[:-1], bins = edges, weights = counts, **kwargs)
 
 def range_plot(x, **kwargs):
-    center = np.mean([np.min(x), np.max(x)])
+    s = summarize(x)
+    center = np.mean([s.min, s.max])
     
-    y = plt.hist(x, **kwargs)[0].max()
+    y = _summary_hist(s, **kwargs)[0].max()
     y_range = plt.ylim()[1] - plt.ylim()[0]
     x_range = plt.xlim()[1] - plt.xlim()[0]
     
-    plt.hlines(y = 0, xmin = np.min(x) - 0.01*x_range, xmax = np.max(x) + 0.01*x_range)
+    plt.hlines(y = 0, xmin = s.min - 0.01*x_range, xmax = s.max + 0.01*x_range)
     plt.annotate(text = 'Range', ha = 'center', va = 'bottom', fontweight = 'bold',
                  xy = (center, y + 0.05*y_range), fontsize = 14)
-    plt.plot([np.min(x), np.max(x)], [y + 0.05*y_range, y + 0.05*y_range], linewidth = 3, color = 'black')
-    plt.plot([np.min(x), np.min(x)], [y+.02*y_range, y + .08*y_range], linewidth = 3, color = 'black')
-    plt.plot([np.max(x), np.max(x)], [y+.02*y_range, y + .08*y_range], linewidth = 3, color = 'black')
+    plt.plot([s.min, s.max], [y + 0.05*y_range, y + 0.05*y_range], linewidth = 3, color = 'black')
+    plt.plot([s.min, s.min], [y+.02*y_range, y + .08*y_range], linewidth = 3, color = 'black')
+    plt.plot([s.max, s.max], [y+.02*y_range, y + .08*y_range], linewidth = 3, color = 'black')
 
     plt.ylim(-.1*y_range, y + 0.15*y_range);
 
 def std_plot(x, **kwargs):
-    mu = np.mean(x)
-    sigma = np.std(x)
+    s = summarize(x)
+    mu = s.mean
+    sigma = s.std()
 
-    y = plt.hist(x, **kwargs)[0].max()
+    y = _summary_hist(s, **kwargs)[0].max()
     y_range = plt.ylim()[1] - plt.ylim()[0]
     x_range = plt.xlim()[1] - plt.xlim()[0]
 
-    plt.hlines(y = 0, xmin = np.min(x) - 0.01*x_range, xmax = np.max(x) + 0.01*x_range)
+    plt.hlines(y = 0, xmin = s.min - 0.01*x_range, xmax = s.max + 0.01*x_range)
     plt.annotate(text = 'Mean', ha = 'center', va = 'top', fontweight = 'bold',
-                 xy = (np.mean(x), -.01*y_range), xytext = (np.mean(x), -.15*y_range), arrowprops=dict(width = 8, headwidth = 20, facecolor = 'red'))
+                 xy = (mu, -.01*y_range), xytext = (mu, -.15*y_range), arrowprops=dict(width = 8, headwidth = 20, facecolor = 'red'))
 
     plt.annotate(text = '$\sigma$', ha = 'center', va = 'bottom', fontweight = 'bold',
                   xy = (mu - sigma / 2, y + 0.05*y_range), fontsize = 14)
@@ -52,15 +123,14 @@ def std_plot(x, **kwargs):
 
 
 def iqr_plot(x, **kwargs):
-    lq = np.quantile(x, 0.25)
-    uq = np.quantile(x, 0.75)
-    med = np.quantile(x, 0.5)
+    s = summarize(x)
+    lq, uq, med = s.quantile([0.25, 0.75, 0.5])
 
-    y = plt.hist(x, **kwargs)[0].max()
+    y = _summary_hist(s, **kwargs)[0].max()
     y_range = plt.ylim()[1] - plt.ylim()[0]
     x_range = plt.xlim()[1] - plt.xlim()[0]
 
-    plt.hlines(y = 0, xmin = np.min(x) - 0.01*x_range, xmax = np.max(x) + 0.01*x_range)
+    plt.hlines(y = 0, xmin = s.min - 0.01*x_range, xmax = s.max + 0.01*x_range)
     plt.annotate(text = 'Median', ha = 'center', va = 'top', fontweight = 'bold',
                  xy = (med, -.01*y_range), xytext = (med, -.15*y_range), arrowprops=dict(width = 8, headwidth = 20, facecolor = 'blue'))
 
@@ -74,22 +144,39 @@ def iqr_plot(x, **kwargs):
 
     plt.ylim(-.22*y_range, y + 0.15*y_range);
 
-def qq_plot(data, **kwargs):
-    mu = np.mean(data)
-    sigma = np.std(data)
+def qq_plot(data, max_points = 5000, **kwargs):
+    s = summarize(data)
+    mu = s.mean
+    sigma = s.std()
     
-    sm.qqplot(data, line='45', loc = mu, scale = sigma, **kwargs);
+    if s.exact and s.count <= max_points:
+        sm.qqplot(s.sorted_values(), line='45', loc = mu, scale = sigma, **kwargs);
+        return
 
-def hypot_plot_mean(data, popmean, type = 'both', area = True):
-    
-    df = len(data) - 1
-    
-    test_stat, p = ttest_1samp(data, popmean = popmean)
+    # Large columns: plot max_points quantiles from the summary instead of every sorted value.
+    probabilities = np.arange(1, max_points + 1) / (max_points + 1)
+    theoretical = norm.ppf(probabilities, loc = mu, scale = sigma)
+    ax = kwargs.pop('ax', None) or plt.subplots()[1]
+    ax.plot(theoretical, s.quantile(probabilities), marker = kwargs.pop('marker', 'o'), linestyle = 'None', **kwargs)
+    end_points = [min(ax.get_xlim()[0], ax.get_ylim()[0]), max(ax.get_xlim()[1], ax.get_ylim()[1])]
+    ax.plot(end_points, end_points, 'r-')
+    ax.set_xlabel('Theoretical Quantiles')
+    ax.set_ylabel('Sample Quantiles');
+
+_ALTERNATIVES = {'both': 'two-sided', 'left': 'smaller', 'right': 'larger'}
+
+def hypot_plot(result, type = 'both', area = True, title = None):
+    """
+    Draws the null distribution of a single test from nssstats.hypothesis_tests, shading the
+    p-value area for type 'both', 'left' or 'right'. Index a batch result to pick the test to draw.
+    """
+    if type not in _ALTERNATIVES:
+        raise ValueError("Invalid entry to 'type' input. Type must be 'both', 'left' or 'right'.")
     
-    if type != 'both':
-        p = p/2
+    pdf = result.pdf
+    test_stat = float(result.statistic)
     
-    p = round(p,4)
+    p = round(float(result.p_value(_ALTERNATIVES[type])),4)
     
     x_min = min(-np.abs(test_stat) - 0.25, -3)
     x_max = max(np.abs(test_stat) + 0.25, 3)
@@ -98,7 +185,7 @@ def hypot_plot_mean(data, popmean, type = 'both', area = True):
     x = np.linspace(x_min, x_max, 100)
     
     fig, ax = plt.subplots(1, 1, figsize = (8,4))
-    ax.plot(x, t.pdf(x, df = df),'r-', lw=3, alpha=1, label='norm pdf', color = 'black')
+    ax.plot(x, pdf(x),'r-', lw=3, alpha=1, label='norm pdf', color = 'black')
     
     if type == 'both':
         left_section = np.linspace(x_min, -np.abs(test_stat), 100)
@@ -118,9 +205,9 @@ def hypot_plot_mean(data, popmean, type = 'both', area = True):
     
     if area:
         for section in sections:
-            plt.fill_between(section, t.pdf(section, df = df), color = 'red')
+            plt.fill_between(section, pdf(section), color = 'red')
     for edge in edges:
-        plt.vlines(x = edge, ymin =0, ymax = t.pdf(edge, df = df), lw = 3, color = 'black')
+        plt.vlines(x = edge, ymin =0, ymax = pdf(edge), lw = 3, color = 'black')
         plt.annotate(text = np.round(edge,4), xy = (edge, -0.01), fontsize = 14, fontweight = 'bold', 
                      va = 'top', ha = 'center')
         
@@ -130,34 +217,28 @@ def hypot_plot_mean(data, popmean, type = 'both', area = True):
     if area:
         area = p
         if type == 'both':
-            #area = round(2*t.cdf(-np.abs(test_stat), df = n-1), 4)
-
             test_stat = np.abs(test_stat)
 
             plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.01),
-                    xytext = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.2),
+                    xy = ((test_stat + x_max) / 2, pdf((test_stat + x_max)/2) + 0.01),
+                    xytext = ((test_stat + x_max) / 2, pdf((test_stat + x_max)/2) + 0.2),
                     arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
 
             plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = (-test_stat + 0.1, t.pdf(test_stat, df = df)/2),
-                    xytext = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.2),
+                    xy = (-test_stat + 0.1, pdf(test_stat)/2),
+                    xytext = ((test_stat + x_max) / 2, pdf((test_stat + x_max)/2) + 0.2),
                     arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
 
         if type == 'right':
-            #area = round(t.cdf(-test_stat, df = n-1), 4)
-
             plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.01),
-                    xytext = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.2),
+                    xy = ((test_stat + x_max) / 2, pdf((test_stat + x_max)/2) + 0.01),
+                    xytext = ((test_stat + x_max) / 2, pdf((test_stat + x_max)/2) + 0.2),
                     arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
 
         if type == 'left':
-            #area = round(t.cdf(test_stat, df = n-1), 4)
-
             plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_min) / 2, t.pdf((test_stat + x_min)/2, df = df) + 0.01),
-                    xytext = ((test_stat + x_min) / 2, t.pdf((test_stat + x_min)/2, df = df) + 0.2),
+                    xy = ((test_stat + x_min) / 2, pdf((test_stat + x_min)/2) + 0.01),
+                    xytext = ((test_stat + x_min) / 2, pdf((test_stat + x_min)/2) + 0.2),
                     arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
     
     
@@ -173,102 +254,22 @@ def hypot_plot_mean(data, popmean, type = 'both', area = True):
     ax.spines['left'].set_visible(False)
     plt.ylim(plt.ylim()[0] - .05, plt.ylim()[1])
     plt.tight_layout()
-    plt.title('Sampling Distribution of the $\\frac{\\bar{x} - \\mu}{s / \\sqrt{n}}$, Assuming $H_0$', fontsize = 14);
-
-def hypot_plot_mean_2sample(data1, data2, type = 'both', area = True):
-    
-    df = min(len(data1) - 1, len(data2) -1)
-    
-    test_stat, p = ttest_ind(data1, data2, equal_var = False)
-    
-    if type != 'both':
-        p = p/2
-    
-    p = round(p,4)
-    
-    x_min = min(-np.abs(test_stat) - 0.25, -3)
-    x_max = max(np.abs(test_stat) + 0.25, 3)
-    
-    
-    x = np.linspace(x_min, x_max, 100)
-    
-    fig, ax = plt.subplots(1, 1, figsize = (8,4))
-    ax.plot(x, t.pdf(x, df = df),'r-', lw=3, alpha=1, label='norm pdf', color = 'black')
-    
-    if type == 'both':
-        left_section = np.linspace(x_min, -np.abs(test_stat), 100)
-        right_section = np.linspace(np.abs(test_stat), x_max, 100)
-        sections = [left_section, right_section]
-        edges = [-np.abs(test_stat), np.abs(test_stat)]
-        
-    elif type == 'left':
-        left_section = np.linspace(x_min, test_stat, 100)
-        sections = [left_section]
-        edges = [test_stat]
+    if title is not None:
+        plt.title(title, fontsize = 14);
 
-    elif type == 'right':
-        right_section = np.linspace(test_stat, x_max, 100)
-        sections = [right_section]
-        edges = [test_stat]
+def hypot_plot_mean(data, popmean, type = 'both', area = True):
     
-    if area:
-        for section in sections:
-            plt.fill_between(section, t.pdf(section, df = df), color = 'red')
-    for edge in edges:
-        plt.vlines(x = edge, ymin =0, ymax = t.pdf(edge, df = df), lw = 3, color = 'black')
-        plt.annotate(text = np.round(edge,4), xy = (edge, -0.01), fontsize = 14, fontweight = 'bold', 
-                     va = 'top', ha = 'center')
-        
-    plt.annotate(text = 'Test\n Statistic', ha = 'center', va = 'top', fontweight = 'bold',
-             xy = (test_stat, -.05), xytext = (test_stat, -.1), arrowprops=dict(width = 8, headwidth = 20, facecolor = 'red'))
+    result = ttest_1samp_batch(data, popmean = popmean)
     
-    if area:
-        area = p
-        if type == 'both':
-            #area = round(2*t.cdf(-np.abs(test_stat), df = n-1), 4)
+    hypot_plot(result, type = type, area = area,
+               title = 'Sampling Distribution of the $\\frac{\\bar{x} - \\mu}{s / \\sqrt{n}}$, Assuming $H_0$')
 
-            test_stat = np.abs(test_stat)
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.01),
-                    xytext = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = (-test_stat + 0.1, t.pdf(test_stat, df = df)/2),
-                    xytext = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
-
-        if type == 'right':
-            #area = round(t.cdf(-test_stat, df = n-1), 4)
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.01),
-                    xytext = ((test_stat + x_max) / 2, t.pdf((test_stat + x_max)/2, df = df) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
-
-        if type == 'left':
-            #area = round(t.cdf(test_stat, df = n-1), 4)
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_min) / 2, t.pdf((test_stat + x_min)/2, df = df) + 0.01),
-                    xytext = ((test_stat + x_min) / 2, t.pdf((test_stat + x_min)/2, df = df) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
+def hypot_plot_mean_2sample(data1, data2, type = 'both', area = True):
     
+    result = ttest_welch_batch(data1, data2)
     
-    plt.hlines(y = 0, xmin = min(-3, -np.abs(test_stat + 0.25)), xmax = max(3, np.abs(test_stat + .25)))
-    plt.yticks([])
-    plt.xticks([])
-    plt.annotate(text = '0', xy = (0, -0.01), fontsize = 14, fontweight = 'bold', 
-                 va = 'top', ha = 'center')  
-       
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    plt.ylim(plt.ylim()[0] - .05, plt.ylim()[1])
-    plt.tight_layout()
-    plt.title('Sampling Distribution of the $\\frac{\\bar{x}_1 - \\bar{x}_2}{s}$, Assuming $H_0$', fontsize = 14);
+    hypot_plot(result, type = type, area = area,
+               title = 'Sampling Distribution of the $\\frac{\\bar{x}_1 - \\bar{x}_2}{s}$, Assuming $H_0$')
 
 
 def hypot_plot_proportion_2sample(counts, nobs, alternative = 'two-sided', area = True):
@@ -280,94 +281,12 @@ def hypot_plot_proportion_2sample(counts, nobs, alternative = 'two-sided', area
     elif alternative == 'larger':
         type = 'right'
     
-    test_stat, p = proportions_ztest(counts, nobs, alternative = alternative)
-    
-    p = round(p,4)
-    
-    x_min = min(-np.abs(test_stat) - 0.25, -3)
-    x_max = max(np.abs(test_stat) + 0.25, 3)
-    
-    x = np.linspace(x_min, x_max, 100)
-    
-    fig, ax = plt.subplots(1, 1, figsize = (8,4))
-    ax.plot(x, norm.pdf(x),'r-', lw=3, alpha=1, label='norm pdf', color = 'black')
-    
-    if type == 'both':
-        left_section = np.linspace(x_min, -np.abs(test_stat), 100)
-        right_section = np.linspace(np.abs(test_stat), x_max, 100)
-        sections = [left_section, right_section]
-        edges = [-np.abs(test_stat), np.abs(test_stat)]
-        
-    elif type == 'left':
-        left_section = np.linspace(x_min, test_stat, 100)
-        sections = [left_section]
-        edges = [test_stat]
-
-    elif type == 'right':
-        right_section = np.linspace(test_stat, x_max, 100)
-        sections = [right_section]
-        edges = [test_stat]
-    
-    if area:
-        for section in sections:
-            plt.fill_between(section, norm.pdf(section), color = 'red')
-    for edge in edges:
-        plt.vlines(x = edge, ymin =0, ymax = norm.pdf(edge), lw = 3, color = 'black')
-        plt.annotate(text = np.round(edge,4), xy = (edge, -0.01), fontsize = 14, fontweight = 'bold', 
-                     va = 'top', ha = 'center')
-        
-    plt.annotate(text = 'Test\n Statistic', ha = 'center', va = 'top', fontweight = 'bold',
-             xy = (test_stat, -.05), xytext = (test_stat, -.1), arrowprops=dict(width = 8, headwidth = 20, facecolor = 'red'))
+    result = proportions_ztest_counts(counts[0], nobs[0], counts[1], nobs[1])
     
-    if area:
-        area = p
-        if type == 'both':
-            #area = round(2*t.cdf(-np.abs(test_stat), df = n-1), 4)
-
-            test_stat = np.abs(test_stat)
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_max) / 2, norm.pdf((test_stat + x_max)/2) + 0.01),
-                    xytext = ((test_stat + x_max) / 2, norm.pdf((test_stat + x_max)/2) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
+    hypot_plot(result, type = type, area = area,
+               title = 'Sampling Distribution of the $\\frac{\\bar{p}_1 - \\bar{p}_2}{s_p}$, Assuming $H_0$')
 
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = (-test_stat + 0.1, norm.pdf(test_stat)/2),
-                    xytext = ((test_stat + x_max) / 2, norm.pdf((test_stat + x_max)/2) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
-
-        if type == 'right':
-            #area = round(t.cdf(-test_stat, df = n-1), 4)
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_max) / 2, norm.pdf((test_stat + x_max)/2) + 0.01),
-                    xytext = ((test_stat + x_max) / 2, norm.pdf((test_stat + x_max)/2) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
-
-        if type == 'left':
-            #area = round(t.cdf(test_stat, df = n-1), 4)
-
-            plt.annotate(text = 'Area = {}'.format(area), ha = 'center', fontweight = 'bold', fontsize = 14,
-                    xy = ((test_stat + x_min) / 2, norm.pdf((test_stat + x_min)/2) + 0.01),
-                    xytext = ((test_stat + x_min) / 2, norm.pdf((test_stat + x_min)/2) + 0.2),
-                    arrowprops=dict(width = 4, headwidth = 8, facecolor = 'black'))
-    
-    
-    plt.hlines(y = 0, xmin = min(-3, -np.abs(test_stat + 0.25)), xmax = max(3, np.abs(test_stat + .25)))
-    plt.yticks([])
-    plt.xticks([])
-    plt.annotate(text = '0', xy = (0, -0.01), fontsize = 14, fontweight = 'bold', 
-                 va = 'top', ha = 'center')  
-       
-    ax.spines['top'].set_visible(False)
-    ax.spines['right'].set_visible(False)
-    ax.spines['bottom'].set_visible(False)
-    ax.spines['left'].set_visible(False)
-    plt.ylim(plt.ylim()[0] - .05, plt.ylim()[1])
-    plt.tight_layout()
-    plt.title('Sampling Distribution of the $\\frac{\\bar{p}_1 - \\bar{p}_2}{s_p}$, Assuming $H_0$', fontsize = 14);
-
-def deviation_plot(Player, df):
+def deviation_plot(Player, df, render = 'auto', max_points = None, pixels = None):
     
     i = df.player.tolist().index(Player)
     
@@ -379,7 +298,8 @@ def deviation_plot(Player, df):
     print('Mean Salary: ${:,}'.format(int(mean)))
     
     fig, ax = plt.subplots(figsize = (10,3))
-    plt.scatter(df['salary'], [0 + 0.015]*len(df['salary']), edgecolor = 'black', s = 100)
+    scatter_points(df['salary'], np.full(len(df['salary']), 0 + 0.015), render = render, max_points = max_points,
+                   pixels = pixels, edgecolor = 'black', s = 100)
     xmin, xmax = plt.xlim()
     
     plt.scatter([salary], [0 + 0.015], edgecolor = 'black', color = 'orange', s = 100)
@@ -409,9 +329,69 @@ def deviation_plot(Player, df):
     plt.ylim(-0.15, 0.2)
     plt.yticks([]);
 
+class StreamingCalibration():
+    """
+    Per-bin counts for a calibration curve, accumulated chunk by chunk with np.bincount.
+    `bins` is a number of equal-width bins over [0, 1] or an increasing array of bin edges;
+    a bin includes its lower edge, and probabilities outside the edges go in the end bins.
+    Accumulators with the same edges can be merged.
+    """
+    def __init__(self, bins = 5):
+        self.edges = np.linspace(0., 1. + 1e-8, bins + 1) if np.ndim(bins) == 0 else np.asarray(bins, dtype = float)
+        self.bin_sums = np.zeros(len(self.edges) - 1)
+        self.bin_true = np.zeros(len(self.edges) - 1)
+        self.bin_total = np.zeros(len(self.edges) - 1, dtype = np.int64)
+
+    def update(self, y_true, y_prob):
+        y_prob = np.asarray(y_prob, dtype = float)
+        binids = np.clip(np.searchsorted(self.edges, y_prob, side = 'right') - 1, 0, len(self.bin_total) - 1)
+        self.bin_sums += np.bincount(binids, weights=y_prob, minlength=len(self.bin_total))
+        self.bin_true += np.bincount(binids, weights=np.asarray(y_true, dtype = float), minlength=len(self.bin_total))
+        self.bin_total += np.bincount(binids, minlength=len(self.bin_total))
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only accumulators with the same bin edges can be merged.")
+        self.bin_sums += other.bin_sums
+        self.bin_true += other.bin_true
+        self.bin_total += other.bin_total
+        return self
+
+    def table(self, alpha = 0.05, method = 'normal'):
+        """
+        One row per non-empty bin: its edges, count, mean predicted probability, observed rate and
+        the 1 - alpha confidence interval for the rate (any proportion_confint method, such as
+        'normal', 'wilson' or 'beta' for Clopper-Pearson), computed for all bins in one call.
+        """
+        nonzero = self.bin_total != 0
+        counts, nobs = self.bin_true[nonzero], self.bin_total[nonzero]
+        lower_bound, upper_bound = proportion_confint(count = counts, nobs = nobs, alpha = alpha, method = method)
+
+        return pd.DataFrame({'bin_lower': self.edges[:-1][nonzero], 'bin_upper': self.edges[1:][nonzero],
+                             'count': nobs, 'prob_pred': self.bin_sums[nonzero] / nobs, 'prob_true': counts / nobs,
+                             'lower_bound': lower_bound, 'upper_bound': upper_bound})
+
+def calibration_table(y_true, y_prob, n_bins=5, strategy='quantile', alpha = 0.05, method = 'normal'):
+    """
+    Compute-only part of `calibration_curve`: the `StreamingCalibration.table` for bins chosen by
+    `strategy`, 'quantile' (the same number of points per bin) or 'uniform' (identical widths).
+    """
+    if strategy == 'quantile':  # Determine bin edges by distribution of data
+        quantiles = np.linspace(0, 1, n_bins + 1)
+        bins = np.percentile(y_prob, quantiles * 100)
+        bins[-1] = bins[-1] + 1e-8
+    elif strategy == 'uniform':
+        bins = np.linspace(0., 1. + 1e-8, n_bins + 1)
+    else:
+        raise ValueError("Invalid entry to 'strategy' input. Strategy "
+                         "must be either 'quantile' or 'uniform'.")
+
+    return StreamingCalibration(bins).update(y_true, y_prob).table(alpha = alpha, method = method)
+
 def calibration_curve(y_true, y_prob, n_bins=5,
                       strategy='quantile', alpha = 0.05,
-                     figsize = (6,4), original_data = True):
+                     figsize = (6,4), original_data = True, method = 'normal', max_points = 10000):
     """Compute true and predicted probabilities for a calibration curve.
     The method assumes the inputs come from a binary classifier.
     Calibration curves may also be referred to as reliability diagrams.
@@ -436,6 +416,11 @@ def calibration_curve(y_true, y_prob, n_bins=5,
             All bins have identical widths.
         quantile
             All bins have the same number of points.
+    method : str, (default='normal')
+        proportion_confint method for the bin intervals, e.g. 'wilson' or 'beta'.
+    max_points : int, (default=10000)
+        With original_data, at most this many randomly chosen points are drawn
+        (rasterized), so the figure stays small for millions of predictions.
     References
     ----------
     Alexandru Niculescu-Mizil and Rich Caruana (2005) Predicting Good
@@ -443,49 +428,21 @@ def calibration_curve(y_true, y_prob, n_bins=5,
     International Conference on Machine Learning (ICML).
     See section 4 (Qualitative Analysis of Predictions).
     """
-    if strategy == 'quantile':  # Determine bin edges by distribution of data
-        quantiles = np.linspace(0, 1, n_bins + 1)
-        bins = np.percentile(y_prob, quantiles * 100)
-        bins[-1] = bins[-1] + 1e-8
-    elif strategy == 'uniform':
-        bins = np.linspace(0., 1. + 1e-8, n_bins + 1)
-    else:
-        raise ValueError("Invalid entry to 'strategy' input. Strategy "
-                         "must be either 'quantile' or 'uniform'.")
-
-    binids = np.digitize(y_prob, bins) - 1
-
-    bin_sums = np.bincount(binids, weights=y_prob, minlength=len(bins))
-    bin_true = np.bincount(binids, weights=y_true, minlength=len(bins))
-    bin_total = np.bincount(binids, minlength=len(bins))
-    
-    lower_bound = np.zeros_like(bin_total).astype('float')
-    upper_bound = np.zeros_like(bin_total).astype('float')
-    
-    for i, (count, nobs) in enumerate(zip(bin_true, bin_total)):
-        if nobs != 0:
-            lower_bound[i], upper_bound[i] = proportion_confint(count = count, nobs = nobs, alpha = alpha)
-        else:
-            pass
-        
-
-    nonzero = bin_total != 0
-    prob_true = (bin_true[nonzero] / bin_total[nonzero])
-    prob_pred = (bin_sums[nonzero] / bin_total[nonzero])
-    
-    lower_bound = lower_bound[nonzero]
-    upper_bound = upper_bound[nonzero]
+    table = calibration_table(y_true, y_prob, n_bins = n_bins, strategy = strategy, alpha = alpha, method = method)
     
     fig, ax = plt.subplots(figsize = figsize)
     
-    plt.scatter(prob_pred, prob_true, edgecolor = 'black')
+    plt.scatter(table['prob_pred'], table['prob_true'], edgecolor = 'black')
     # Add the confidence intervals:
-    for lb, ub, x in zip(lower_bound, upper_bound, prob_pred):
-        plt.plot([x, x], [lb, ub], color = 'black')
+    plt.vlines(table['prob_pred'], table['lower_bound'], table['upper_bound'], color = 'black')
     
     # Include the original data
     if original_data:
-        plt.scatter(y_prob, 1.1*y_true - 0.05, alpha = 0.5, color = 'red', zorder = -5)
+        y_true, y_prob = np.asarray(y_true), np.asarray(y_prob)
+        if len(y_prob) > max_points:
+            sample = np.random.default_rng(0).choice(len(y_prob), max_points, replace = False)
+            y_true, y_prob = y_true[sample], y_prob[sample]
+        plt.scatter(y_prob, 1.1*y_true - 0.05, alpha = 0.5, color = 'red', zorder = -5, rasterized = True)
     
     plt.plot([-0.05, 1.05], [-0.05, 1.05], color = 'black', linestyle = '--')
     plt.xlabel('Predicted Probability')
@@ -494,16 +451,18 @@ def calibration_curve(y_true, y_prob, n_bins=5,
     plt.xlim(-0.1, 1.1)
     plt.ylim(-0.1, 1.1)
 
-def predicted_probability_plot(y_true, y_proba):
+def predicted_probability_plot(y_true, y_proba, render = 'auto', max_points = None, pixels = None):
     alpha = 0.6
 
     fig, ax = plt.subplots(figsize = (6,2))
-    plt.scatter(y_proba[y_true==0], (np.zeros_like(y_true) - 0.05 + 0.1*(y_true == 1))[y_true==0], 
-                c = 'blue', label = 'non-carrier', 
-                alpha = alpha, edgecolor = 'black')
-    plt.scatter(y_proba[y_true==1], (np.zeros_like(y_true) - 0.05 + 0.1*(y_true == 1))[y_true==1], 
-                c = 'red', label = 'carrier', 
-                alpha = alpha, edgecolor = 'black')
+    scatter_points(y_proba[y_true==0], (np.zeros_like(y_true) - 0.05 + 0.1*(y_true == 1))[y_true==0], 
+                   render = render, max_points = max_points, pixels = pixels,
+                   c = 'blue', label = 'non-carrier', 
+                   alpha = alpha, edgecolor = 'black')
+    scatter_points(y_proba[y_true==1], (np.zeros_like(y_true) - 0.05 + 0.1*(y_true == 1))[y_true==1], 
+                   render = render, max_points = max_points, pixels = pixels,
+                   c = 'red', label = 'carrier', 
+                   alpha = alpha, edgecolor = 'black')
 
     plt.plot([-.0,1.], [0,0], linewidth = 3, color = 'black')
 
@@ -519,12 +478,13 @@ def predicted_probability_plot(y_true, y_proba):
     plt.legend()
     plt.ylim(-0.5, 0.5);
 
-def quadrant_plot(x, y, quadrant = None, figsize = (8,6), labels = None):
+def quadrant_plot(x, y, quadrant = None, figsize = (8,6), labels = None, render = 'auto', max_points = None, pixels = None):
     x_mean = np.mean(x)
     y_mean = np.mean(y)
     
     fig, ax = plt.subplots(figsize = figsize)
-    plt.scatter(x = x, y = y, zorder = 500, color = 'black', alpha = 0.7)
+    scatter_points(x, y, render = render, max_points = max_points, pixels = pixels,
+                   zorder = 500, color = 'black', alpha = 0.7)
     plt.axvline(x = x_mean, color = 'black')
     plt.axhline(y = y_mean, color = 'black')
     if labels:
@@ -543,12 +503,13 @@ def quadrant_plot(x, y, quadrant = None, figsize = (8,6), labels = None):
             r1 = Rectangle((plt.xlim()[0], y_mean), x_mean - plt.xlim()[0], plt.ylim()[1] - y_mean, color=color, alpha = 0.5)
         ax.add_artist(r1);
 
-def half_plot(x, y, half = None, figsize = (8,6), labels = None):
+def half_plot(x, y, half = None, figsize = (8,6), labels = None, render = 'auto', max_points = None, pixels = None):
     x_mean = np.mean(x)
     y_mean = np.mean(y)
     
     fig, ax = plt.subplots(figsize = figsize)
-    plt.scatter(x = x, y = y, zorder = 500, color = 'black', alpha = 0.7)
+    scatter_points(x, y, render = render, max_points = max_points, pixels = pixels,
+                   zorder = 500, color = 'black', alpha = 0.7)
     plt.axvline(x = x_mean, color = 'black')
     plt.axhline(y = y_mean, color = 'black')
     if labels:
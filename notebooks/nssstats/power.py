@@ -0,0 +1,184 @@
+import numpy as np
+import pandas as pd
+
+from .bootstrap import _get_executor, _seed_sequence, generate_bootstraps
+from .hypothesis_tests import ttest_1samp_batch, ttest_welch_batch, proportions_ztest_counts
+from .permutation import sequential_permutation_test
+
+# Designs simulate the groups for every effect size at once, as arrays of shape
+# (effect size, replicate, observation). All effect sizes share the same random draws,
+# so estimated power moves smoothly with the effect size.
+
+def _one_sample(rng, effect_sizes, nobs, num_replicates, sd = 1):
+    noise = sd * rng.standard_normal((1, num_replicates, nobs))
+    return (noise + effect_sizes[:, None, None],)
+
+def _two_sample(rng, effect_sizes, nobs, num_replicates, sd = 1):
+    treatment = sd * rng.standard_normal((1, num_replicates, nobs))
+    control = sd * rng.standard_normal((1, num_replicates, nobs))
+    return treatment + effect_sizes[:, None, None], control
+
+def _proportion(rng, effect_sizes, nobs, num_replicates, baseline = 0.5):
+    treatment = rng.random((1, num_replicates, nobs)) < baseline + effect_sizes[:, None, None]
+    control = rng.random((1, num_replicates, nobs)) < baseline
+    return treatment, control
+
+DESIGNS = {'one-sample': _one_sample, 'two-sample': _two_sample, 'proportion': _proportion}
+
+# Tests take the simulated groups and return a p-value for every (effect size, replicate).
+
+def _t(groups, alternative, alpha, rng, popmean = 0):
+    return ttest_1samp_batch(groups[0], popmean = popmean, axis = -1).p_value(alternative)
+
+def _welch(groups, alternative, alpha, rng):
+    return ttest_welch_batch(*groups, axis = -1).p_value(alternative)
+
+def _proportion_z(groups, alternative, alpha, rng):
+    treatment, control = groups
+    nobs = treatment.shape[-1]
+    return proportions_ztest_counts(treatment.sum(axis = -1), nobs, control.sum(axis = -1), nobs).p_value(alternative)
+
+def _permutation(groups, alternative, alpha, rng, **kwargs):
+    # Besag-Clifford sequential permutation test per replicate, stopping once the decision at alpha is clear.
+    treatment, control = np.broadcast_arrays(*groups)
+    p = np.empty(treatment.shape[:2])
+    for index in np.ndindex(*p.shape):
+        values = np.concatenate([treatment[index], control[index]])
+        p[index] = sequential_permutation_test(values, treatment.shape[-1], alternative = alternative, alpha = alpha,
+                                               random_state = rng, **kwargs)[0]
+    return p
+
+def _bootstrap(groups, alternative, alpha, rng, num_resamples = 1000):
+    # Bootstrap test of the mean (one group) or difference in means (two groups) against 0,
+    # using the bootstrap distribution centered on the observed value as the null distribution.
+    groups = np.broadcast_arrays(*groups)
+    p = np.empty(groups[0].shape[:2])
+    for index in np.ndindex(*p.shape):
+        boots = [generate_bootstraps(group[index], num_resamples = num_resamples, random_state = rng) for group in groups]
+        observed = np.mean(groups[0][index]) - (np.mean(groups[1][index]) if len(groups) == 2 else 0)
+        null = boots[0] - (boots[1] if len(groups) == 2 else 0) - observed
+        if alternative == 'larger':
+            p[index] = np.mean(null >= observed)
+        elif alternative == 'smaller':
+            p[index] = np.mean(null <= observed)
+        elif alternative == 'two-sided':
+            p[index] = np.mean(np.abs(null) >= np.abs(observed))
+        else:
+            raise ValueError("Invalid entry to 'alternative' input. Alternative "
+                             "must be 'larger', 'smaller' or 'two-sided'.")
+    return p
+
+TESTS = {'t': _t, 'welch': _welch, 'proportion': _proportion_z, 'permutation': _permutation, 'bootstrap': _bootstrap}
+
+def _block_sizes(num_replicates, nobs, max_values = 2**20):
+    # The replicate blocks depend only on num_replicates and nobs, so a cell gets the same
+    # simulations whichever other effect sizes it is computed with.
+    block = max(1, min(num_replicates, max_values // nobs))
+    return [block] * (num_replicates // block) + ([num_replicates % block] if num_replicates % block else [])
+
+def _power_cells(nobs, effect_sizes, seed, design, test, num_replicates, alpha, alternative,
+                 design_kwargs, test_kwargs):
+    effect_sizes = np.asarray(effect_sizes, dtype = float)
+    block_sizes = _block_sizes(num_replicates, nobs)
+    rejections = np.zeros(len(effect_sizes))
+    for size, block_seed in zip(block_sizes, seed.spawn(len(block_sizes))):
+        rng = np.random.default_rng(block_seed)
+        groups = design(rng, effect_sizes, nobs, size, **design_kwargs)
+        rejections += np.sum(test(groups, alternative, alpha, rng, **test_kwargs) <= alpha, axis = 1)
+    return rejections / num_replicates
+
+class PowerAnalysis():
+    """
+    Simulation-based power for a study design, over grids of effect sizes and sample sizes.
+
+    design is 'one-sample' (normal data with mean effect_size), 'two-sample' (normal treatment
+    group shifted by effect_size against a control group of the same size) or 'proportion'
+    (treatment rate baseline + effect_size against baseline), or a function
+    design(rng, effect_sizes, nobs, num_replicates, **design_kwargs) returning the groups as arrays
+    of shape (effect size, replicate, observation), treatment first. test is 't', 'welch',
+    'proportion', 'permutation' (nssstats.permutation.sequential_permutation_test) or 'bootstrap'
+    (nssstats.bootstrap.generate_bootstraps), or a function test(groups, alternative, alpha, rng,
+    **test_kwargs) returning a p-value for every effect size and replicate.
+
+    The t and z tests run on all replicates in one vectorized call; the permutation and bootstrap
+    tests loop over replicates, so use fewer replicates with them. Each sample size gets its own
+    random stream, and its results are cached, so repeated and overlapping grids and
+    `required_sample_size` reuse earlier simulations. Sample sizes are spread over n_jobs processes
+    (-1 for all cores), or over an `executor`, as in nssstats.bootstrap; custom designs and tests
+    must then be importable functions.
+    """
+    def __init__(self, design = 'two-sample', test = 'welch', alpha = 0.05, alternative = 'two-sided',
+                 num_replicates = 2000, random_state = None, n_jobs = 1, executor = None,
+                 design_kwargs = None, test_kwargs = None):
+        self.design = DESIGNS[design] if isinstance(design, str) else design
+        self.test = TESTS[test] if isinstance(test, str) else test
+        self.alpha = alpha
+        self.alternative = alternative
+        self.num_replicates = num_replicates
+        self.n_jobs = n_jobs
+        self.executor = executor
+        self.design_kwargs = design_kwargs or {}
+        self.test_kwargs = test_kwargs or {}
+        self._seed = _seed_sequence(random_state)
+        self._cache = {}
+
+    def _cell_seed(self, nobs):
+        return np.random.SeedSequence(self._seed.entropy, spawn_key = self._seed.spawn_key + (int(nobs),))
+
+    def _compute(self, nobs, effect_sizes):
+        return _power_cells(nobs, effect_sizes, self._cell_seed(nobs), self.design, self.test, self.num_replicates,
+                            self.alpha, self.alternative, self.design_kwargs, self.test_kwargs)
+
+    def power(self, effect_sizes, sample_sizes):
+        """
+        Estimated power for every effect size and sample size (per group), as a DataFrame with one
+        row per effect size and one column per sample size.
+        """
+        effect_sizes = [float(effect) for effect in np.atleast_1d(effect_sizes)]
+        sample_sizes = [int(nobs) for nobs in np.atleast_1d(sample_sizes)]
+        todo = {}
+        for nobs in sample_sizes:
+            missing = [effect for effect in effect_sizes if (effect, nobs) not in self._cache]
+            if missing:
+                todo[nobs] = sorted(set(missing))
+
+        if todo and (self.n_jobs != 1 or self.executor is not None) and len(todo) > 1:
+            pool, owned = _get_executor(self.n_jobs, self.executor)
+            try:
+                futures = {nobs: pool.submit(_power_cells, nobs, effects, self._cell_seed(nobs), self.design, self.test,
+                                             self.num_replicates, self.alpha, self.alternative, self.design_kwargs,
+                                             self.test_kwargs)
+                           for nobs, effects in todo.items()}
+                results = {nobs: future.result() for nobs, future in futures.items()}
+            finally:
+                if owned:
+                    pool.shutdown()
+        else:
+            results = {nobs: self._compute(nobs, effects) for nobs, effects in todo.items()}
+
+        for nobs, effects in todo.items():
+            self._cache.update({(effect, nobs): power for effect, power in zip(effects, results[nobs])})
+
+        surface = pd.DataFrame([[self._cache[(effect, nobs)] for nobs in sample_sizes] for effect in effect_sizes],
+                               index = pd.Index(effect_sizes, name = 'effect_size'),
+                               columns = pd.Index(sample_sizes, name = 'nobs'))
+        return surface
+
+    def required_sample_size(self, effect_size, power = 0.8, min_nobs = 2, max_nobs = 10000):
+        """
+        Smallest sample size (per group) between min_nobs and max_nobs whose estimated power reaches
+        `power`, found by bisection over cached simulations. Raises ValueError if even max_nobs falls short.
+        """
+        achieved = lambda nobs: self.power(effect_size, nobs).iloc[0, 0] >= power
+        if achieved(min_nobs):
+            return min_nobs
+        if not achieved(max_nobs):
+            raise ValueError("Power {} is not reached with {} observations; raise max_nobs.".format(power, max_nobs))
+        low, high = min_nobs, max_nobs
+        while high - low > 1:
+            middle = (low + high) // 2
+            if achieved(middle):
+                high = middle
+            else:
+                low = middle
+        return high
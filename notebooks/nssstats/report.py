@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from types import CodeType
+
+import numpy as np
+import pandas as pd
+import matplotlib
+
+MANIFEST = '.nssstats-report.json'
+
+def _use_agg():
+    matplotlib.use('Agg')
+
+def _update_code_hash(h, code):
+    # Bytecode plus the constants (titles, colours, bin counts, nested functions) and names it uses.
+    h.update(code.co_code)
+    _update_hash(h, list(code.co_names))
+    for const in code.co_consts:
+        _update_hash(h, const)
+
+def _update_hash(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        h.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            _update_hash(h, list(obj.columns))
+        else:
+            _update_hash(h, obj.name)
+        h.update(pd.util.hash_pandas_object(obj, index = not isinstance(obj, pd.Index)).values.tobytes())
+    elif isinstance(obj, np.ndarray) and obj.dtype != object:
+        h.update('{}{}'.format(obj.dtype.str, obj.shape).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, (list, tuple, np.ndarray)):
+        h.update('{}{}'.format(type(obj).__name__, len(obj)).encode())
+        for item in obj:
+            _update_hash(h, item)
+    elif isinstance(obj, dict):
+        h.update('dict{}'.format(len(obj)).encode())
+        for key in sorted(obj, key = repr):
+            _update_hash(h, key)
+            _update_hash(h, obj[key])
+    elif callable(obj) and hasattr(obj, '__code__'):
+        h.update('{}.{}'.format(obj.__module__, obj.__qualname__).encode())
+        _update_code_hash(h, obj.__code__)
+        _update_hash(h, obj.__defaults__)
+        _update_hash(h, obj.__kwdefaults__)
+        # Closures by the values they capture, so lambdas over different data differ.
+        # A function capturing itself (recursion) contributes its name instead.
+        cells = [cell.cell_contents if cell.cell_contents is not obj else obj.__qualname__
+                 for cell in obj.__closure__ or ()]
+        _update_hash(h, cells)
+    elif isinstance(obj, CodeType):
+        _update_code_hash(h, obj)
+    elif obj is None or isinstance(obj, (str, bytes, bool, int, float, complex, np.generic)):
+        h.update(repr(obj).encode())
+    else:
+        h.update(pickle.dumps(obj))
+
+def job_hash(func, args = (), kwargs = None, **savefig_kwargs):
+    """
+    Content hash of a plot job: the function (by name, bytecode, constants, defaults and closure
+    values), its arguments (pandas and numpy data by value) and the savefig options.
+    """
+    h = hashlib.sha256()
+    for part in (func, tuple(args), kwargs or {}, savefig_kwargs):
+        _update_hash(h, part)
+    return h.hexdigest()
+
+def _figure(result):
+    import matplotlib.pyplot as plt
+    from matplotlib.figure import Figure
+    if isinstance(result, Figure):
+        return result
+    if isinstance(getattr(result, 'figure', None), Figure):
+        return result.figure
+    return plt.gcf()
+
+def render_job(func, args, kwargs, path, **savefig_kwargs):
+    """Calls func(*args, **kwargs), saves the figure it drew (or returned) to path and closes the figures it opened."""
+    import matplotlib.pyplot as plt
+    open_figures = set(plt.get_fignums())
+    try:
+        fig = _figure(func(*args, **(kwargs or {})))
+        root, ext = os.path.splitext(path)
+        tmp_path = '{}.tmp{}'.format(root, ext)
+        fig.savefig(tmp_path, **savefig_kwargs)
+        os.replace(tmp_path, path)
+    finally:
+        for num in set(plt.get_fignums()) - open_figures:
+            plt.close(num)
+    return path
+
+def _normalize_jobs(jobs):
+    if isinstance(jobs, dict):
+        items = jobs.items()
+    else:
+        items = (('{:03d}_{}'.format(i, job[0].__name__), job) for i, job in enumerate(jobs))
+    normalized = {}
+    for name, job in items:
+        if len(job) not in (2, 3):
+            raise ValueError("Each job must be a (function, args) or (function, args, kwargs) tuple.")
+        func, args, kwargs = (tuple(job) + ({},))[:3]
+        normalized[name] = (func, tuple(args), kwargs)
+    return normalized
+
+def render_report(jobs, output_dir, format = 'png', n_jobs = -1, executor = None, force = False, in_process = False,
+                  **savefig_kwargs):
+    """
+    Render plot jobs to image files in output_dir, skipping those whose output is already cached.
+
+    jobs is a list of (function, args) or (function, args, kwargs) tuples, or a dict mapping file
+    names to such tuples; list jobs are named '000_roc_curve', '001_iqr_plot', .... Each job must
+    draw on a new matplotlib figure (or return a Figure or Axes), as cm_analysis, roc_curve,
+    calibration_curve, hypot_plot_* and iqr_plot do.
+
+    A job is rendered only if force is True or its content hash (see job_hash) differs from the
+    one recorded for its file in the output directory's manifest, so rerunning a report redraws only
+    what changed. Edits to helpers called by a plot function are not part of the hash; use force
+    after changing those. Jobs run on the Agg backend across n_jobs worker processes (-1 for all
+    cores), even when only one job needs rendering. Pass executor to use an existing
+    concurrent.futures executor instead; its workers must set the Agg backend themselves, e.g.
+    ProcessPoolExecutor(initializer = matplotlib.use, initargs = ('Agg',)). Pass in_process = True
+    to render in the current process on its current backend instead, e.g. for debugging a job.
+
+    Returns a DataFrame indexed by job name with the output path, the hash and whether the cached
+    file was reused.
+    """
+    jobs = _normalize_jobs(jobs)
+    os.makedirs(output_dir, exist_ok = True)
+    manifest_path = os.path.join(output_dir, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+
+    savefig_kwargs['format'] = format
+    table = pd.DataFrame(index = pd.Index(list(jobs), name = 'job'), columns = ['path', 'hash', 'cached'])
+    todo = []
+    for name, (func, args, kwargs) in jobs.items():
+        filename = '{}.{}'.format(name, format)
+        path = os.path.join(output_dir, filename)
+        digest = job_hash(func, args, kwargs, **savefig_kwargs)
+        cached = not force and manifest.get(filename) == digest and os.path.exists(path)
+        table.loc[name] = [path, digest, cached]
+        if not cached:
+            todo.append((name, filename, path, digest))
+
+    pool = None
+    try:
+        if todo and not in_process:
+            workers = min(len(todo), os.cpu_count() if n_jobs == -1 else n_jobs)
+            pool = executor or ProcessPoolExecutor(max_workers = workers, initializer = _use_agg)
+            futures = [(filename, digest, pool.submit(render_job, *jobs[name], path, **savefig_kwargs))
+                       for name, filename, path, digest in todo]
+            errors = []
+            for filename, digest, future in futures:
+                try:
+                    future.result()
+                except Exception as error:
+                    errors.append(error)
+                    continue
+                manifest[filename] = digest
+            if errors:
+                raise errors[0]
+        else:
+            for name, filename, path, digest in todo:
+                render_job(*jobs[name], path, **savefig_kwargs)
+                manifest[filename] = digest
+    finally:
+        if pool is not None and executor is None:
+            pool.shutdown()
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent = 1, sort_keys = True)
+
+    table['cached'] = table['cached'].astype(bool)
+    return table
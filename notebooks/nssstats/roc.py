@@ -1,6 +1,9 @@
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import gridspec
+from scipy.stats import norm, rankdata
+
+from .bootstrap import _seed_sequence
 
 def calc_tpr(y_true, y_prob, threshold = 0.5):
     tp = len(y_prob[(y_true == 1) & (y_prob >= threshold)])
@@ -14,14 +17,226 @@ def calc_fpr(y_true, y_prob, threshold = 0.5):
     
     return fpr
 
-def tpr_fpr(y_true, y_prob):
-    thresholds = np.linspace(start = 0, stop = 1, num = 100)
-    tpr = [calc_tpr(y_true, y_prob, threshold) for threshold in thresholds]
-    fpr = [calc_fpr(y_true, y_prob, threshold) for threshold in thresholds]
+def roc_table(y_true, y_prob, max_points = None):
+    """
+    Exact ROC curve from one sort of the scores: the false positive rate, true positive rate
+    and threshold (predict positive when y_prob >= threshold) at every distinct score, starting
+    from threshold = inf where nothing is predicted positive.
+    If `max_points` is given, the curve is thinned to about that many evenly spaced points, keeping both ends.
+    """
+    y_true = np.asarray(y_true)
+    y_prob = np.asarray(y_prob, dtype = float)
+    order = np.argsort(-y_prob, kind = 'stable')
+    scores = y_prob[order]
+    positives = np.cumsum(y_true[order] == 1)
+
+    # Last position of each distinct score: a threshold there takes in every tie at once.
+    last = np.r_[np.nonzero(np.diff(scores))[0], len(scores) - 1]
+    tp = np.r_[0, positives[last]]
+    fp = np.r_[0, last + 1 - positives[last]]
+    thresholds = np.r_[np.inf, scores[last]]
+
+    if max_points is not None and len(thresholds) > max_points:
+        keep = np.unique(np.linspace(0, len(thresholds) - 1, max_points).round().astype(int))
+        tp, fp, thresholds = tp[keep], fp[keep], thresholds[keep]
+
+    return fp / max(fp[-1], 1), tp / max(tp[-1], 1), thresholds
+
+def _operating_point(fpr, tpr, thresholds, threshold):
+    # Thresholds are in decreasing order; find the last one at or above `threshold`.
+    i = np.searchsorted(-thresholds, -threshold, side = 'right') - 1
+    return fpr[i], tpr[i]
+
+def tpr_fpr(y_true, y_prob, max_points = None, return_thresholds = False):
+    fpr, tpr, thresholds = roc_table(y_true, y_prob, max_points = max_points)
+    if return_thresholds:
+        return tpr, fpr, thresholds
     return tpr, fpr
 
-def roc_curve(y_true, y_prob, area = False):
-    tpr, fpr = tpr_fpr(y_true, y_prob)
+def auc(y_true, y_prob):
+    """
+    Area under the ROC curve from the ranks of the scores (the Mann-Whitney statistic), with ties counted as half.
+    y_prob may be 2-D, one row of scores per model, giving one AUC per model.
+    """
+    return delong(y_true, y_prob)[0]
+
+def delong(y_true, y_prob):
+    """
+    AUCs and their DeLong covariance matrix for one or more score vectors on the same labels,
+    computed from midranks as in Sun and Xu (2014). y_prob is 1-D or (models x samples).
+    """
+    y_true = np.asarray(y_true) == 1
+    scores = np.atleast_2d(np.asarray(y_prob, dtype = float))
+    positives, negatives = scores[:, y_true], scores[:, ~y_true]
+    m, n = positives.shape[1], negatives.shape[1]
+
+    combined_ranks = rankdata(np.hstack([positives, negatives]), axis = 1)
+    positive_ranks = rankdata(positives, axis = 1)
+    negative_ranks = rankdata(negatives, axis = 1)
+
+    aucs = (combined_ranks[:, :m].sum(axis = 1) / m - (m + 1) / 2) / n
+    # Structural components: each positive's share of negatives below it, and each negative's share of positives above it.
+    positive_components = (combined_ranks[:, :m] - positive_ranks) / n
+    negative_components = 1 - (combined_ranks[:, m:] - negative_ranks) / m
+    covariance = (np.atleast_2d(np.cov(positive_components)) / m
+                  + np.atleast_2d(np.cov(negative_components)) / n)
+
+    if np.ndim(y_prob) == 1:
+        return aucs[0], covariance[0, 0]
+    return aucs, covariance
+
+def delong_test(y_true, y_prob_a, y_prob_b):
+    """
+    DeLong test that two models scored on the same observations have the same AUC.
+    Returns the z statistic for AUC(a) - AUC(b) and its two-sided p-value.
+    """
+    aucs, covariance = delong(y_true, np.vstack([y_prob_a, y_prob_b]))
+    z = (aucs[0] - aucs[1]) / np.sqrt(covariance[0, 0] + covariance[1, 1] - 2 * covariance[0, 1])
+    return z, 2 * norm.sf(np.abs(z))
+
+def _bootstrap_auc_blocks(scores, y_true, num_resamples, chunk_size, random_state):
+    # Per-model sort order and tie groups, computed once and reused by every resample.
+    y_true = np.asarray(y_true) == 1
+    positive_index, negative_index = np.nonzero(y_true)[0], np.nonzero(~y_true)[0]
+    m, n = len(positive_index), len(negative_index)
+    orders = np.argsort(scores, axis = 1, kind = 'stable')
+    groups = []
+    for model_scores, order in zip(scores, orders):
+        sorted_scores = model_scores[order]
+        groups.append(np.r_[0, np.nonzero(np.diff(sorted_scores))[0] + 1])
+
+    rng = np.random.default_rng(_seed_sequence(random_state))
+    for start in range(0, num_resamples, chunk_size):
+        size = min(chunk_size, num_resamples - start)
+        # Stratified resample: m draws from the positives and n from the negatives, as counts per observation.
+        rows = np.repeat(np.arange(size), m + n)
+        draws = np.hstack([positive_index[rng.integers(0, m, size = (size, m))],
+                           negative_index[rng.integers(0, n, size = (size, n))]]).ravel()
+        counts = np.bincount(rows * len(y_true) + draws, minlength = size * len(y_true)).reshape(size, -1)
+        positive_counts, negative_counts = counts * y_true, counts * ~y_true
+
+        aucs = np.empty((size, len(scores)))
+        for k, (order, starts) in enumerate(zip(orders, groups)):
+            tied_positives = np.add.reduceat(positive_counts[:, order], starts, axis = 1)
+            tied_negatives = np.add.reduceat(negative_counts[:, order], starts, axis = 1)
+            negatives_below = np.cumsum(tied_negatives, axis = 1) - tied_negatives
+            aucs[:, k] = np.sum(tied_positives * (negatives_below + 0.5 * tied_negatives), axis = 1) / (m * n)
+        yield start, aucs
+
+def bootstrap_auc(y_true, y_prob, num_resamples = 10000, chunk_size = None, max_bytes = 2**27, random_state = None):
+    """
+    AUCs of `num_resamples` stratified bootstrap resamples (positives and negatives resampled
+    separately). Each model's scores are sorted once; a resample only reweights the sorted
+    observations. For 2-D y_prob every model sees the same resamples, so differences are paired.
+    """
+    scores = np.atleast_2d(np.asarray(y_prob, dtype = float))
+    if chunk_size is None:
+        # About six (resamples x observations) integer arrays are live per block.
+        chunk_size = max(1, int(max_bytes // (6 * 8 * scores.shape[1])))
+
+    resample_aucs = np.empty((num_resamples, len(scores)))
+    for start, aucs in _bootstrap_auc_blocks(scores, y_true, num_resamples, chunk_size, random_state):
+        resample_aucs[start:start + len(aucs)] = aucs
+
+    return resample_aucs[:, 0] if np.ndim(y_prob) == 1 else resample_aucs
+
+def auc_ci(y_true, y_prob, conf_level = 0.95, method = 'delong', **kwargs):
+    """
+    Confidence interval for the AUC, from the DeLong standard error or ('bootstrap') the same
+    interval as bootstrap_ci over `bootstrap_auc` resamples, to which kwargs are passed.
+    """
+    estimate = auc(y_true, y_prob)
+    margin = (1 - conf_level) / 2
+    if method == 'delong':
+        # One model gives a variance, several a covariance matrix with the variances on its diagonal.
+        variance = delong(y_true, y_prob)[1]
+        se = np.sqrt(np.diag(variance) if np.ndim(variance) == 2 else variance)
+        return estimate - norm.ppf(1 - margin) * se, estimate + norm.ppf(1 - margin) * se
+    if method == 'bootstrap':
+        resample_aucs = bootstrap_auc(y_true, y_prob, **kwargs)
+        top_quantile = np.quantile(resample_aucs, q = 1 - margin, axis = 0)
+        bottom_quantile = np.quantile(resample_aucs, q = margin, axis = 0)
+        return estimate - (top_quantile - estimate), estimate + (estimate - bottom_quantile)
+    raise ValueError("Invalid entry to 'method' input. Method must be either 'delong' or 'bootstrap'.")
+
+class StreamingROC():
+    """
+    Mergeable ROC sketch for scores too many to hold in memory: counts of positives and
+    negatives in fixed score bins, updated chunk by chunk.
+
+    Bins are `bins` equal-width bins over `score_range`, or any increasing `edges`; use
+    `from_sample` for quantile-spaced edges taken from a sample of the scores. Scores outside the
+    edges are counted in the end bins. Sketches with the same edges can be merged across
+    processes, and saved with `save` and reloaded with `load`.
+
+    Error bound: ROC points at the bin edges are exact, so the curve is the exact one thinned to
+    the edges, and confusion counts are exact for thresholds on an edge (other thresholds are
+    moved down to the nearest edge, which changes counts by at most that bin's contents). The
+    AUC treats scores in the same bin as tied, so it is within `auc_error_bound()` =
+    sum(positives_b * negatives_b) / (2 * P * N) of the exact AUC.
+    """
+    def __init__(self, bins = 1000, score_range = (0, 1), edges = None):
+        self.edges = np.linspace(*score_range, bins + 1) if edges is None else np.asarray(edges, dtype = float)
+        self.positives = np.zeros(len(self.edges) - 1, dtype = np.int64)
+        self.negatives = np.zeros(len(self.edges) - 1, dtype = np.int64)
+
+    @classmethod
+    def from_sample(cls, y_prob, bins = 1000):
+        edges = np.unique(np.quantile(y_prob, np.linspace(0, 1, bins + 1)))
+        return cls(edges = edges)
+
+    def update(self, y_true, y_prob):
+        y_true = np.asarray(y_true) == 1
+        binids = np.clip(np.searchsorted(self.edges, y_prob, side = 'right') - 1, 0, len(self.positives) - 1)
+        self.positives += np.bincount(binids[y_true], minlength = len(self.positives))
+        self.negatives += np.bincount(binids[~y_true], minlength = len(self.negatives))
+        return self
+
+    def merge(self, other):
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Only sketches with the same bin edges can be merged.")
+        self.positives += other.positives
+        self.negatives += other.negatives
+        return self
+
+    def save(self, filename):
+        np.savez(filename, edges = self.edges, positives = self.positives, negatives = self.negatives)
+
+    @classmethod
+    def load(cls, filename):
+        with np.load(filename) as data:
+            sketch = cls(edges = data['edges'])
+            sketch.positives, sketch.negatives = data['positives'], data['negatives']
+        return sketch
+
+    def _cumulative(self):
+        # Counts at or above each lower bin edge, from the top bin down, starting with nothing predicted positive.
+        tp = np.r_[0, np.cumsum(self.positives[::-1])]
+        fp = np.r_[0, np.cumsum(self.negatives[::-1])]
+        thresholds = np.r_[np.inf, self.edges[-2::-1]]
+        return tp, fp, thresholds
+
+    def roc(self):
+        """False positive rates, true positive rates and thresholds, in the same layout as `roc_table`."""
+        tp, fp, thresholds = self._cumulative()
+        return fp / max(fp[-1], 1), tp / max(tp[-1], 1), thresholds
+
+    def auc(self):
+        fpr, tpr, thresholds = self.roc()
+        return np.sum(np.diff(fpr) * (tpr[1:] + tpr[:-1]) / 2)
+
+    def auc_error_bound(self):
+        return np.sum(self.positives * self.negatives) / (2 * max(self.positives.sum() * self.negatives.sum(), 1))
+
+    def confusion(self, threshold = 0.5):
+        """Confusion counts [[TN, FP], [FN, TP]] (the layout cm_analysis annotates) at the bin edge at or below `threshold`."""
+        tp, fp, thresholds = self._cumulative()
+        # Thresholds are in decreasing order; take the first one at or below `threshold`.
+        i = min(np.searchsorted(-thresholds, -threshold, side = 'left'), len(thresholds) - 1)
+        return np.array([[fp[-1] - fp[i], fp[i]], [tp[-1] - tp[i], tp[i]]])
+
+def roc_curve(y_true, y_prob, area = False, max_points = None):
+    tpr, fpr = tpr_fpr(y_true, y_prob, max_points = max_points)
     
     roc_plot = plt.plot(fpr, tpr)
     if area:
@@ -33,7 +248,12 @@ def roc_curve(y_true, y_prob, area = False):
     
     return roc_plot;
 
-def roc_interact(threshold, y_true, y_prob, tpr, fpr, alpha = 0.6):
+def roc_interact(threshold, y_true, y_prob, tpr, fpr, alpha = 0.6, thresholds = None):
+    """
+    Predicted probabilities and ROC curve with the operating point at `threshold`, for ipywidgets.interact.
+    Pass the thresholds from `tpr_fpr(y_true, y_prob, return_thresholds = True)` along with tpr and fpr
+    to look the operating point up in that table; otherwise it is counted from the data at each call.
+    """
     fig = plt.figure(figsize=(7, 7)) 
     gs = gridspec.GridSpec(2, 1, height_ratios=[1, 3]) 
     
@@ -48,7 +268,7 @@ def roc_interact(threshold, y_true, y_prob, tpr, fpr, alpha = 0.6):
     ax0.plot([-.0,1.], [0,0], linewidth = 3, color = 'black')
     for i in [0,1]:
         ax0.plot([i,i], [0.1, -0.1], linewidth = 3, color = 'black')
-        ax0.annotate(s = str(i), xy = (i, -0.125), ha = 'center', va = 'top', fontsize = 12, fontweight = 'bold')
+        ax0.annotate(str(i), xy = (i, -0.125), ha = 'center', va = 'top', fontsize = 12, fontweight = 'bold')
         
     ax0.plot([threshold, threshold], [-0.4, 0.4], color = 'red', linestyle = '--', linewidth = 3)
     
@@ -68,4 +288,108 @@ def roc_interact(threshold, y_true, y_prob, tpr, fpr, alpha = 0.6):
     plt.xlabel('False Positive Rate')
     plt.ylabel('True Positive Rate')
     
-    ax1.scatter([calc_fpr(y_true, y_prob, threshold)], [calc_tpr(y_true, y_prob, threshold)], color = 'black', zorder = 500);
+    if thresholds is not None:
+        point_fpr, point_tpr = _operating_point(fpr, tpr, thresholds, threshold)
+    else:
+        point_fpr, point_tpr = calc_fpr(y_true, y_prob, threshold), calc_tpr(y_true, y_prob, threshold)
+    ax1.scatter([point_fpr], [point_tpr], color = 'black', zorder = 500);
+
+def _is_interactive(canvas):
+    # Canvases that stay on screen to be updated: GUI ones (Qt, Tk, ...) name the framework they
+    # need, and the browser ones (webagg, nbagg, ipympl's widget) derive from the webagg canvas.
+    # Agg, the inline backend and the file backends are neither.
+    from matplotlib.backends.backend_webagg_core import FigureCanvasWebAggCore
+    return (getattr(canvas, 'required_interactive_framework', None) is not None
+            or isinstance(canvas, FigureCanvasWebAggCore))
+
+def _display(fig):
+    try:
+        from IPython.display import display
+    except ImportError:
+        return
+    display(fig)
+
+class ROCExplorer():
+    """
+    Interactive threshold explorer with the same layout as `roc_interact`, for large data.
+
+    The scatter of predicted probabilities, the ROC curve and the diagonal are drawn once and the
+    ROC table is computed once. `update(threshold)` only moves the threshold line and the
+    operating point, found by binary search, so it can be passed straight to ipywidgets.interact:
+
+        explorer = ROCExplorer(y_true, y_prob)
+        interact(explorer.update, threshold = (0, 1, 0.01))
+
+    On interactive backends (e.g. %matplotlib widget) the two artists are blitted over the saved
+    background of the figure on screen. Non-interactive backends such as %matplotlib inline keep
+    no figure on screen to update, so there `update` renders the figure again and displays it
+    (in the interact output); the figure is not shown when the explorer is created.
+    """
+    def __init__(self, y_true, y_prob, threshold = 0.5, alpha = 0.6):
+        y_true = np.asarray(y_true)
+        y_prob = np.asarray(y_prob, dtype = float)
+        self.fpr, self.tpr, self.thresholds = roc_table(y_true, y_prob)
+
+        self.fig = plt.figure(figsize=(7, 7))
+        gs = gridspec.GridSpec(2, 1, height_ratios=[1, 3])
+
+        ax0 = self.fig.add_subplot(gs[0])
+        for label, color, name in [(0, 'blue', 'non-carrier'), (1, 'red', 'carrier')]:
+            ax0.scatter(y_prob[y_true == label], np.full(np.sum(y_true == label), -0.05 + 0.1*label),
+                        c = color, label = name, alpha = alpha, edgecolor = 'black', rasterized = True)
+        ax0.plot([-.0,1.], [0,0], linewidth = 3, color = 'black')
+        for i in [0,1]:
+            ax0.plot([i,i], [0.1, -0.1], linewidth = 3, color = 'black')
+            ax0.annotate(str(i), xy = (i, -0.125), ha = 'center', va = 'top', fontsize = 12, fontweight = 'bold')
+        ax0.set_title("Predicted Probabilities")
+        ax0.set_yticks([])
+        ax0.legend(loc = 'upper right')
+        ax0.set_ylim(-0.5, 0.75)
+
+        ax1 = self.fig.add_subplot(gs[1])
+        ax1.plot(self.fpr, self.tpr, linewidth = 1.5)
+        ax1.plot([0,1], [0,1], color = 'black')
+        ax1.set_title('ROC Curve')
+        ax1.set_xlabel('False Positive Rate')
+        ax1.set_ylabel('True Positive Rate')
+
+        # Only these two artists change; on interactive backends they are left out of normal
+        # draws and blitted over a saved background.
+        self.interactive = _is_interactive(self.fig.canvas)
+        self.threshold_line, = ax0.plot([threshold, threshold], [-0.4, 0.4], color = 'red', linestyle = '--',
+                                        linewidth = 3, animated = self.interactive)
+        self.point = ax1.scatter(*_operating_point(self.fpr, self.tpr, self.thresholds, threshold),
+                                 color = 'black', zorder = 500, animated = self.interactive)
+        self.background = None
+        if self.interactive:
+            self.fig.canvas.mpl_connect('draw_event', self._on_draw)
+            self.fig.canvas.draw()
+        else:
+            # Shown by update instead, so inline does not also show the initial figure.
+            plt.close(self.fig)
+
+    def _on_draw(self, event):
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox) if self.fig.canvas.supports_blit else None
+        self._draw_animated()
+
+    def _draw_animated(self):
+        self.fig.draw_artist(self.threshold_line)
+        self.fig.draw_artist(self.point)
+
+    def update(self, threshold):
+        self.threshold_line.set_xdata([threshold, threshold])
+        self.point.set_offsets([_operating_point(self.fpr, self.tpr, self.thresholds, threshold)])
+
+        if not self.interactive:
+            _display(self.fig)
+            return
+        if self.background is None:
+            # Interactive backends without blitting need a full redraw.
+            self.threshold_line.set_animated(False)
+            self.point.set_animated(False)
+            self.fig.canvas.draw_idle()
+            return
+        self.fig.canvas.restore_region(self.background)
+        self._draw_animated()
+        self.fig.canvas.blit(self.fig.bbox)
+        self.fig.canvas.flush_events()
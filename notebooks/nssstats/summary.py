@@ -0,0 +1,215 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+
+class QuantileSketch():
+    """
+    Mergeable quantile sketch in the style of the merging t-digest (Dunning and Ertl, 2019).
+
+    Values are kept as weighted centroids. Compression sorts the centroids and merges those falling
+    in the same unit step of the scale k(q) = compression / (2 pi) * arcsin(2q - 1), so there are at
+    most about `compression` centroids and they are smallest, and most accurate, in the tails.
+    """
+    def __init__(self, compression = 1000, buffer_size = 2**15):
+        self.compression = compression
+        self.buffer_size = buffer_size
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype = float).ravel()
+        if len(values) == 0:
+            return self
+        self.min = min(self.min, values.min())
+        self.max = max(self.max, values.max())
+        # Values are merged in buffers of buffer_size, so each compression only sorts the buffer
+        # and the current centroids rather than all the values at once.
+        for start in range(0, len(values), self.buffer_size):
+            buffer = np.sort(values[start:start + self.buffer_size])
+            # Insert the (sorted) centroids into the sorted buffer instead of argsorting both.
+            positions = np.searchsorted(buffer, self.means)
+            means = np.insert(buffer, positions, self.means)
+            weights = np.insert(np.ones(len(buffer)), positions, self.weights)
+            self._compress_sorted(means, weights)
+        return self
+
+    def merge(self, other):
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        self.means = np.r_[self.means, other.means]
+        self.weights = np.r_[self.weights, other.weights]
+        self._compress()
+        return self
+
+    def _compress(self):
+        order = np.argsort(self.means, kind = 'stable')
+        self._compress_sorted(self.means[order], self.weights[order])
+
+    def _compress_sorted(self, means, weights):
+        cumulative = np.cumsum(weights)
+        q = (cumulative - weights / 2) / cumulative[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        # k increases with q, so the centroids of a step are contiguous.
+        steps = np.floor(k)
+        groups = np.r_[0, np.cumsum(steps[1:] != steps[:-1])]
+        self.weights = np.bincount(groups, weights = weights)
+        self.means = np.bincount(groups, weights = weights * means) / self.weights
+
+    def quantile(self, q):
+        # Interpolate between centroid means placed at the middle of their weight, with the exact min and max at the ends.
+        cumulative = np.cumsum(self.weights)
+        total = cumulative[-1]
+        positions = np.r_[0, (cumulative - self.weights / 2) / total, 1]
+        return np.interp(q, positions, np.r_[self.min, self.means, self.max])
+
+    def cdf(self, x):
+        cumulative = np.cumsum(self.weights)
+        positions = np.r_[0, (cumulative - self.weights / 2) / cumulative[-1], 1]
+        return np.interp(x, np.r_[self.min, self.means, self.max], positions)
+
+class ColumnSummary():
+    """
+    Moments, quantiles and histograms of a column, computed once and shared by range_plot,
+    std_plot, iqr_plot and qq_plot.
+
+    Data can be given at once or added in chunks with `update`; moments are combined with Chan's
+    parallel formulas. Up to `exact_limit` values are kept for exact quantiles (by partial sorting
+    with np.quantile) and histograms, and only sorted if sorted_values is asked for. Past that the
+    values are folded into a `QuantileSketch` and dropped, so quantiles become approximate and a
+    summary holds at most exact_limit values whatever the column's size. The values seen when the
+    sketch is started are also counted into a fine histogram of `histogram_bins` equal bins, which
+    later chunks keep adding to while they stay within its range; histograms are interpolated from
+    it, or else taken from the sketch's distribution function.
+    """
+    def __init__(self, x = None, exact_limit = 10**6, compression = 1000, histogram_bins = 10000):
+        self.exact_limit = exact_limit
+        self.count = 0
+        self.mean = 0.
+        self._m2 = 0.
+        self.min = np.inf
+        self.max = -np.inf
+        self.sketch = None
+        self._chunks = []
+        self._sorted = None
+        self._histograms = {}
+        self._fine_histogram = None
+        self.compression = compression
+        self.histogram_bins = histogram_bins
+        if x is not None:
+            self.update(x)
+
+    def update(self, chunk):
+        # Missing values are skipped, as pandas and plt.hist do.
+        chunk = np.asarray(chunk, dtype = float).ravel()
+        chunk = chunk[~np.isnan(chunk)]
+        if len(chunk) == 0:
+            return self
+        n, mean = len(chunk), chunk.mean()
+        m2 = np.sum((chunk - mean)**2)
+        delta = mean - self.mean
+        total = self.count + n
+        self._m2 += m2 + delta**2 * self.count * n / total
+        self.mean += delta * n / total
+        self.count = total
+        self.min, self.max = min(self.min, chunk.min()), max(self.max, chunk.max())
+
+        self._sorted = None
+        self._histograms = {}
+        if self.sketch is None:
+            self._chunks.append(chunk)
+            if self.count > self.exact_limit:
+                values = self.values()
+                self.sketch = QuantileSketch(self.compression).update(values)
+                self._fine_histogram = np.histogram(values, bins = self.histogram_bins, range = (self.min, self.max))
+                self._chunks = []
+        else:
+            self.sketch.update(chunk)
+            if self._fine_histogram is not None:
+                counts, edges = self._fine_histogram
+                if self.min < edges[0] or self.max > edges[-1]:
+                    self._fine_histogram = None
+                else:
+                    counts += np.histogram(chunk, bins = edges)[0]
+        return self
+
+    @property
+    def exact(self):
+        return self.sketch is None
+
+    def std(self, ddof = 0):
+        return np.sqrt(self._m2 / (self.count - ddof))
+
+    def values(self):
+        if len(self._chunks) != 1:
+            self._chunks = [np.concatenate(self._chunks)]
+        return self._chunks[0]
+
+    def sorted_values(self):
+        if self._sorted is None:
+            self._sorted = np.sort(self.values())
+            self._chunks = [self._sorted]
+        return self._sorted
+
+    def quantile(self, q):
+        if self.exact:
+            # A few quantiles only need a partial sort; many (as for qq_plot) are cheaper from one full sort.
+            values = self.sorted_values() if self._sorted is not None or np.size(q) > 16 else self.values()
+            return np.quantile(values, q)
+        return self.sketch.quantile(q)
+
+    def histogram(self, bins = 10, range = None):
+        """Counts and bin edges as from np.histogram, cached per (bins, range)."""
+        key = (bins if np.ndim(bins) == 0 else tuple(bins), None if range is None else tuple(range))
+        if key not in self._histograms:
+            if self.exact:
+                self._histograms[key] = np.histogram(self.values(), bins = bins, range = range)
+            else:
+                if isinstance(bins, str):
+                    raise ValueError("Named bin rules need the exact data; pass a number of bins or the edges.")
+                edges = (np.linspace(*(range if range is not None else (self.min, self.max)), bins + 1)
+                         if np.ndim(bins) == 0 else np.asarray(bins, dtype = float))
+                if self._fine_histogram is not None:
+                    # Off by at most a fine bin's contents at each edge.
+                    counts, fine_edges = self._fine_histogram
+                    cumulative = np.interp(edges, fine_edges, np.r_[0, np.cumsum(counts)])
+                else:
+                    cumulative = self.sketch.cdf(edges) * self.count
+                self._histograms[key] = np.diff(cumulative), edges
+        return self._histograms[key]
+
+# Summaries by a hash of the column's contents, most recently used last.
+_summaries = OrderedDict()
+MAX_SUMMARIES = 8
+
+def _fingerprint(x, kwargs):
+    # Contents rather than identity: pandas can return a new Series for every df['col'], and a
+    # column changed in place must not get its old summary back.
+    values = np.asarray(x)
+    if values.dtype == object:
+        return None
+    values = np.ascontiguousarray(values)
+    digest = hashlib.blake2b(values.view(np.uint8).ravel(), digest_size = 16).hexdigest()
+    return values.dtype.str, values.shape, digest, tuple(sorted(kwargs.items()))
+
+def summarize(x, refresh = False, **kwargs):
+    """
+    ColumnSummary of x, cached by the column's contents (the last MAX_SUMMARIES columns), so
+    plotting the same data again reuses it, whichever Series or array object holds it. Columns
+    longer than exact_limit are summarized by a sketch and histogram, so the cache does not hold
+    copies of them. A ColumnSummary is returned as it is. Pass refresh = True to recompute.
+    """
+    if isinstance(x, ColumnSummary):
+        return x
+    key = _fingerprint(x, kwargs)
+    if key is not None and key in _summaries and not refresh:
+        _summaries.move_to_end(key)
+        return _summaries[key]
+
+    summary = ColumnSummary(x, **kwargs)
+    if key is not None:
+        _summaries[key] = summary
+        while len(_summaries) > MAX_SUMMARIES:
+            _summaries.popitem(last = False)
+    return summary